@@ -0,0 +1,111 @@
+"""
+账号来源：从环境变量、账号文件（每行 手机号,密码 或 JSONL）或标准输入逐个读取账号，
+校验格式并去重，以生成器的形式交给签到流程，账号数量很大时内存占用也保持不变。
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+
+from logger import logger
+
+
+def parse_line(line: str):
+    """
+    解析一行账号信息，支持 手机号,密码、邮箱:密码 和 JSON 对象三种格式
+    :return: (账号, 密码)，格式不正确时返回 None
+    """
+    line = line.strip()
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(entry, dict):
+            return None
+        account = entry.get('account') or entry.get('phone') or entry.get('email')
+        password = entry.get('password')
+        if not isinstance(account, str) or not isinstance(password, str):
+            return None
+    elif ',' in line:
+        account, _, password = line.partition(',')
+    elif ':' in line:
+        account, _, password = line.partition(':')
+    else:
+        return None
+    account, password = account.strip(), password.strip()
+    if not account or not password or any(c.isspace() for c in account):
+        return None
+    return account, password
+
+
+def iter_lines(text: str):
+    # 逐行切分，不一次性生成整个列表
+    for match in re.finditer(r'[^\n]+', text):
+        yield match.group()
+
+
+def iter_file(path: str):
+    """
+    逐行读取账号文件，path 为 - 时读取标准输入
+    """
+    if path == '-':
+        yield from sys.stdin
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from f
+
+
+class AccountSource:
+    """
+    可迭代的账号来源，依次读取各个来源并跳过格式错误和重复的账号。
+    去重只为每个账号保存 8 字节的哈希，不保存账号和密码本身。
+    """
+    def __init__(self, sources):
+        """
+        :param sources: [(来源名称, 逐行产生账号信息的可迭代对象), ...]
+        """
+        self.sources = sources
+        self.stats = {"accounts": 0, "invalid": 0, "duplicates": 0}
+
+    def __iter__(self):
+        seen = set()
+        for name, lines in self.sources:
+            for lineno, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                parsed = parse_line(line)
+                if parsed is None:
+                    self.stats["invalid"] += 1
+                    # 不输出整行，避免密码出现在日志中
+                    logger.warning(f"账号信息格式不正确：{name} 第 {lineno} 行")
+                    continue
+                key = hashlib.md5(parsed[0].encode()).digest()[:8]
+                if key in seen:
+                    self.stats["duplicates"] += 1
+                    continue
+                seen.add(key)
+                self.stats["accounts"] += 1
+                yield parsed
+
+    @property
+    def from_stdin(self) -> bool:
+        return any(name == '-' for name, _ in self.sources)
+
+    @classmethod
+    def from_env(cls, path: str = None) -> "AccountSource":
+        """
+        按顺序合并以下来源：账号文件（环境变量 ACCOUNTS_FILE，- 表示标准输入）、
+        环境变量 ACCOUNTS（每行 手机号,密码）和 HULUXIA_ACCOUNTS（邮箱:密码，以逗号分隔）
+        :param path: 账号文件，默认读取环境变量 ACCOUNTS_FILE
+        """
+        sources = []
+        path = path or os.getenv('ACCOUNTS_FILE')
+        if path:
+            sources.append((path, iter_file(path)))
+        if os.getenv('ACCOUNTS'):
+            sources.append(('ACCOUNTS', iter_lines(os.environ['ACCOUNTS'])))
+        if os.getenv('HULUXIA_ACCOUNTS'):
+            sources.append(('HULUXIA_ACCOUNTS', (m.group() for m in re.finditer(r'[^,]+', os.environ['HULUXIA_ACCOUNTS']))))
+        return cls(sources)
@@ -0,0 +1,115 @@
+"""
+端到端性能测试：启动本地模拟服务器，用合成账号运行完整的 main.py 流程，
+统计总耗时、每个账号的请求数和峰值内存。
+
+用法：
+    python benchmark.py --accounts 1,100,10000 --concurrency 32 --latency 0.02
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_server import MockConfig, start_server
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 在子进程中运行 main.py，结束后输出本进程的峰值内存（KB）
+RUNNER = (
+    "import resource, runpy, sys\n"
+    "root = sys.argv[1]\n"
+    "sys.path.insert(0, root)\n"
+    "sys.argv = [root + '/main.py']\n"
+    "runpy.run_path(root + '/main.py', run_name='__main__')\n"
+    "print('BENCH_MAXRSS=%d' % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+
+
+def run_once(accounts: int, args) -> dict:
+    """
+    用指定数量的合成账号跑一次完整签到流程
+    :return: 本次测试的统计结果
+    """
+    config = MockConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        risk_rate=args.risk_rate, rate_limit=args.rate_limit, token_ttl=args.token_ttl)
+    server, state = start_server(config)
+    # 额外的监听端口作为 HTTP 代理，模拟多个出口 IP
+    proxies = [start_server(config, state=state)[0] for _ in range(args.egress)]
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            accounts_file = os.path.join(workdir, "accounts.jsonl")
+            with open(accounts_file, "w", encoding="utf-8") as f:
+                for i in range(accounts):
+                    f.write(json.dumps({"account": f"bench{i:06d}", "password": f"password{i}"}) + "\n")
+            env = dict(os.environ)
+            env.pop("ACCOUNTS", None)
+            env.pop("HULUXIA_ACCOUNTS", None)
+            env.update({
+                "HULUXIA_BASE_URL": f"http://127.0.0.1:{server.server_port}",
+                "ACCOUNTS_FILE": accounts_file,
+                "STATE_DB": os.path.join(workdir, "state.db"),
+                "CONCURRENCY": str(args.concurrency),
+                "ACCOUNT_INTERVAL": "0",
+                "PACER_MAX_RATE": str(args.max_rate),
+                "PACER_ACCOUNT_MAX_RATE": str(args.max_rate),
+                "NOTIFIER_TYPE": "none",
+                "EGRESS": ",".join(f"http://127.0.0.1:{p.server_port}" for p in proxies) or "direct",
+            })
+            start = time.monotonic()
+            proc = subprocess.run([sys.executable, "-c", RUNNER, ROOT], cwd=workdir, env=env,
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            wall = time.monotonic() - start
+    finally:
+        for s in [server, *proxies]:
+            s.shutdown()
+    maxrss = 0
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH_MAXRSS="):
+            maxrss = int(line.split("=", 1)[1])
+    requests_total = sum(v for k, v in state.stats.items() if k.startswith("/"))
+    return {
+        "accounts": accounts,
+        "exit_code": proc.returncode,
+        "wall_seconds": round(wall, 3),
+        "requests": requests_total,
+        "requests_per_account": round(requests_total / accounts, 2),
+        "http_429": state.stats["429"],
+        "http_500": state.stats["500"],
+        "peak_memory_mb": round(maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="葫芦侠签到端到端性能测试")
+    parser.add_argument("--accounts", default="1,100,10000", help="账号数量，逗号分隔")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发账号数")
+    parser.add_argument("--max-rate", type=float, default=1e6, help="节奏控制器速率上限，默认不限速")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器基础延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="模拟服务器延迟随机浮动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500 概率")
+    parser.add_argument("--risk-rate", type=float, default=0.0, help="签到检测风控概率")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="模拟服务器每秒请求数上限")
+    parser.add_argument("--token-ttl", type=float, default=0.0, help="令牌有效期（秒）")
+    parser.add_argument("--egress", type=int, default=0, help="模拟的出口（代理）数，0 为直连")
+    parser.add_argument("--json", help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'账号数':>8} {'耗时(s)':>10} {'请求/账号':>10} {'429':>6} {'500':>6} {'峰值内存(MB)':>12}")
+    for accounts in (int(n) for n in args.accounts.split(",")):
+        result = run_once(accounts, args)
+        results.append(result)
+        print(f"{result['accounts']:>8} {result['wall_seconds']:>10} {result['requests_per_account']:>10} "
+              f"{result['http_429']:>6} {result['http_500']:>6} {result['peak_memory_mb']:>12}")
+        if result["exit_code"]:
+            print(f"main.py 退出码 {result['exit_code']}", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+from logger import logger
+
+
+class BoardCatalog:
+    """
+    版块目录：从 cat_id.json 或服务器分类接口加载版块列表，从服务器获取的列表缓存到本地文件。
+    同时维护“失效版块”负缓存：同一版块在多个账号上连续失败后，在有效期内对所有账号跳过。
+    """
+    def __init__(self, store, path: str = "cat_id.json", cache_path: str = "board_cache.json",
+                 ttl: float = 86400, source: str = "file", fetch=None,
+                 dead_threshold: int = 3, dead_ttl: float = 7 * 86400):
+        """
+        :param store: StateStore 实例，用于保存失效版块
+        :param path: 本地版块文件
+        :param cache_path: 从服务器获取的版块列表的缓存文件
+        :param ttl: 缓存有效期（秒）
+        :param source: 'file' 从本地文件加载，'server' 从服务器分类接口加载（失败时退回本地文件）
+        :param fetch: 从服务器获取版块的函数，返回 {cat_id: 版块名}
+        :param dead_threshold: 连续多少个账号签到失败后判定版块失效
+        :param dead_ttl: 失效版块的跳过时长（秒）
+        """
+        self.store = store
+        self.path = path
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.source = source
+        self.fetch = fetch
+        self.dead_threshold = dead_threshold
+        self.dead_ttl = dead_ttl
+        self.boards = None
+        self.lock = threading.Lock()
+        store.ensure_table("dead_boards", ("failures", "expire_at"))
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if time.time() - cache.get("fetched_at", 0) > self.ttl:
+            return None
+        return cache.get("boards") or None
+
+    def _write_cache(self, boards: dict):
+        # 先写临时文件再替换，避免写到一半中断导致缓存损坏
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": time.time(), "boards": boards}, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.cache_path)
+
+    def _read_file(self) -> dict:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self) -> dict:
+        """
+        加载版块列表。从服务器获取时优先使用未过期的本地缓存；
+        本地文件每次直接读取，不经过缓存，修改 cat_id.json 后立即生效
+        :return: {cat_id: 版块名}
+        """
+        with self.lock:
+            if self.boards is not None:
+                return self.boards
+            boards = None
+            if self.source == "server" and self.fetch:
+                boards = self._read_cache()
+                if boards is None:
+                    try:
+                        boards = self.fetch()
+                    except Exception as e:
+                        logger.warning(f"从服务器获取版块列表失败，改用本地文件：{e}")
+                    # 退回本地文件时不写缓存，下次运行仍会尝试从服务器获取
+                    if boards:
+                        self._write_cache(boards)
+            if not boards:
+                boards = self._read_file()
+            self.boards = boards
+            return boards
+
+    def active_boards(self) -> dict:
+        """
+        :return: 去掉负缓存中失效版块后的版块列表
+        """
+        now = time.time()
+        active = {}
+        for cat_id, name in self.load().items():
+            dead = self.store.get("dead_boards", cat_id)
+            if dead and dead["expire_at"] and dead["expire_at"] > now:
+                continue
+            active[cat_id] = name
+        return active
+
+    def report(self, cat_id: str, ok: bool):
+        """
+        反馈版块签到结果：成功时清零失败计数，连续失败达到阈值时加入负缓存
+        """
+        with self.lock:
+            dead = self.store.get("dead_boards", cat_id) or {"failures": 0, "expire_at": None}
+            if ok:
+                if dead["failures"]:
+                    self.store.put("dead_boards", cat_id, {"failures": 0, "expire_at": None})
+                return
+            failures = dead["failures"] + 1
+            expire_at = dead["expire_at"]
+            if failures >= self.dead_threshold:
+                expire_at = time.time() + self.dead_ttl
+                name = (self.boards or {}).get(cat_id, cat_id)
+                logger.warning(f"版块 {name} 连续 {failures} 次签到失败，{self.dead_ttl / 86400:.0f} 天内跳过")
+                failures = 0
+            self.store.put("dead_boards", cat_id, {"failures": failures, "expire_at": expire_at})
+
+
+def fetch_server_boards(session: requests.Session, url: str, params: dict, headers: dict) -> dict:
+    """
+    从服务器分类接口获取版块列表
+    :return: {cat_id: 版块名}
+    """
+    res = session.get(url, params=params, headers=headers, timeout=10)
+    data = res.json()
+    if data.get("status") != 1:
+        raise RuntimeError(data.get("msg") or "分类接口返回异常")
+    return {str(c["categoryID"]): c["title"] for c in data.get("categories", []) if c.get("categoryID")}
@@ -0,0 +1,215 @@
+"""
+常驻签到服务：按账号的到期时间排队，在北京时间零点重置后的时间窗口内分散签到。
+
+用法：
+    python daemon.py --accounts-file accounts.txt --window 14400 --concurrency 4
+
+账号文件格式与 main.py 相同（每行 手机号,密码 或一个 JSON 对象），修改文件或发送 SIGHUP 后自动重新加载，无需重启。
+令牌和连接在各次签到之间保持复用，不会在每天的运行开始时重新建立；设置 EGRESS 时账号分散到多个出口。
+"""
+import argparse
+import hashlib
+import heapq
+import itertools
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pytz import timezone
+
+from logger import logger
+from accounts import AccountSource
+from egress import EgressPool
+from signin import HuluxiaSignin, base_url, default_metrics, request_timeout, run_journal, save_hlx_config
+
+TZ = timezone('Asia/Shanghai')
+
+
+def next_reset(now: float) -> float:
+    """
+    :return: now 之后的下一个北京时间零点（时间戳）
+    """
+    local = datetime.fromtimestamp(now, TZ)
+    midnight = TZ.localize(datetime(local.year, local.month, local.day) + timedelta(days=1))
+    return midnight.timestamp()
+
+
+class SigninDaemon:
+    """
+    常驻签到调度器：以到期时间为优先级的队列，每个账号每天在重置后的时间窗口内固定的偏移时刻签到
+    """
+    def __init__(self, accounts_file: str = None, window: float = 4 * 3600, delay: float = 300,
+                 concurrency: int = 4, reload_interval: float = 60, retry_delay: float = 300,
+                 retry_max_delay: float = 3600, max_retries: int = 5):
+        """
+        :param accounts_file: 账号文件，未指定时使用环境变量 ACCOUNTS、HULUXIA_ACCOUNTS（无法热加载）
+        :param window: 每天签到的时间窗口长度（秒），账号按哈希均匀分布在窗口内
+        :param delay: 零点后多久开始签到（秒），避开重置瞬间的高峰
+        :param concurrency: 同时签到的账号数上限
+        :param reload_interval: 检查账号文件变化的间隔（秒）
+        :param retry_delay: 签到未完成（登录失败、网络异常、仍有版块未签到）时首次重试的等待（秒），之后逐次加倍
+        :param retry_max_delay: 重试等待的上限（秒）
+        :param max_retries: 每个账号每天最多重试的次数，只在当天的时间窗口内重试
+        """
+        self.accounts_file = accounts_file
+        self.window = window
+        self.delay = delay
+        self.concurrency = concurrency
+        self.reload_interval = reload_interval
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.max_retries = max_retries
+        self.retries = {}
+        self.egress = EgressPool.from_env(pool_maxsize=concurrency, timeout=request_timeout, health_url=base_url)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.slots = threading.Semaphore(concurrency)
+        self.queue = []
+        self.counter = itertools.count()
+        self.accounts = {}
+        self.running = set()
+        self.mtime = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = False
+
+    def offset(self, account: str) -> float:
+        # 同一账号每天的签到时刻固定
+        return self.delay + int(hashlib.md5(account.encode()).hexdigest(), 16) % max(1, int(self.window))
+
+    def first_due(self, account: str, now: float) -> float:
+        # 今天的签到时刻已过且尚未完成时立即安排，否则等到下一个签到时刻
+        today_due = next_reset(now) - 86400 + self.offset(account)
+        if today_due <= now and not run_journal.account_done(account):
+            return now
+        return today_due if today_due > now else next_reset(now) + self.offset(account)
+
+    def next_due(self, account: str, now: float) -> float:
+        """
+        一次签到结束后的下一个签到时刻：当天已完成时为明天的同一时刻；
+        未完成且当天的时间窗口内还来得及时按退避间隔重试
+        """
+        tomorrow = next_reset(now) + self.offset(account)
+        if run_journal.account_done(account):
+            self.retries.pop(account, None)
+            return tomorrow
+        attempt = self.retries.get(account, 0) + 1
+        window_end = next_reset(now) - 86400 + self.delay + self.window
+        due = now + min(self.retry_max_delay, self.retry_delay * 2 ** (attempt - 1))
+        if attempt > self.max_retries or due > window_end:
+            logger.warning(f"账号 {account} 今日未完成签到，明天再试")
+            self.retries.pop(account, None)
+            return tomorrow
+        self.retries[account] = attempt
+        logger.info(f"账号 {account} 今日未完成签到，{due - now:.0f} 秒后第 {attempt} 次重试")
+        return due
+
+    def schedule(self, account: str, due: float):
+        heapq.heappush(self.queue, (due, next(self.counter), account))
+        self.wakeup.set()
+
+    def load_accounts(self):
+        """
+        加载账号列表，新增账号加入队列，删除的账号在出队时丢弃
+        """
+        if self.accounts_file:
+            if not os.path.exists(self.accounts_file):
+                logger.error(f"账号文件 {self.accounts_file} 不存在")
+                return
+            mtime = os.path.getmtime(self.accounts_file)
+            if mtime == self.mtime:
+                return
+            self.mtime = mtime
+        elif self.accounts:
+            return
+        accounts = dict(AccountSource.from_env(self.accounts_file))
+        now = time.time()
+        with self.lock:
+            added = accounts.keys() - self.accounts.keys()
+            removed = self.accounts.keys() - accounts.keys()
+            self.accounts = accounts
+            for account in added:
+                self.schedule(account, self.first_due(account, now))
+        logger.info(f"已加载 {len(accounts)} 个账号，新增 {len(added)} 个，移除 {len(removed)} 个")
+
+    def run_account(self, account: str, password: str):
+        try:
+            route = self.egress.route(account)
+            summary = HuluxiaSignin(transport=route.transport, pacer=route.pacer).huluxia_signin(account, password)
+            logger.info(summary.strip())
+        except Exception as e:
+            logger.error(f"账号 {account} 签到失败: {e}")
+        finally:
+            save_hlx_config()
+            default_metrics.write_report(os.getenv('METRICS_JSON', 'metrics.json'), os.getenv('METRICS_PROM', 'metrics.prom'))
+            with self.lock:
+                self.running.discard(account)
+                if account in self.accounts:
+                    self.schedule(account, self.next_due(account, time.time()))
+            self.slots.release()
+
+    def run(self):
+        self.egress.start(float(os.getenv('EGRESS_CHECK_INTERVAL', '60')))
+        self.load_accounts()
+        last_reload = time.monotonic()
+        while not self.stopping:
+            if self.accounts_file and time.monotonic() - last_reload >= self.reload_interval:
+                self.load_accounts()
+                last_reload = time.monotonic()
+            with self.lock:
+                due = self.queue[0][0] if self.queue else None
+                self.wakeup.clear()
+            wait = self.reload_interval if due is None else min(self.reload_interval, due - time.time())
+            if wait > 0:
+                self.wakeup.wait(wait)
+                continue
+            self.slots.acquire()
+            # 等待空闲名额期间可能已收到退出信号
+            if self.stopping:
+                self.slots.release()
+                break
+            with self.lock:
+                _, _, account = heapq.heappop(self.queue)
+                password = self.accounts.get(account)
+                # 已删除或仍在签到中的账号丢弃这个排期
+                if password is None or account in self.running:
+                    self.slots.release()
+                    continue
+                self.running.add(account)
+            self.executor.submit(self.run_account, account, password)
+        self.executor.shutdown(wait=True)
+        self.egress.close()
+
+    def reload(self, *args):
+        self.mtime = None
+        self.wakeup.set()
+        threading.Thread(target=self.load_accounts, daemon=True).start()
+
+    def stop(self, *args):
+        logger.info("收到退出信号，等待进行中的签到完成")
+        self.stopping = True
+        self.wakeup.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="葫芦侠三楼常驻签到服务")
+    parser.add_argument('--accounts-file', default=os.getenv('ACCOUNTS_FILE'), help="账号文件，修改后自动重新加载")
+    parser.add_argument('--window', type=float, default=float(os.getenv('DAEMON_WINDOW', '14400')),
+                        help="每天签到的时间窗口（秒）")
+    parser.add_argument('--delay', type=float, default=float(os.getenv('DAEMON_DELAY', '300')),
+                        help="零点后多久开始签到（秒）")
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('CONCURRENCY', '4')))
+    args = parser.parse_args()
+
+    daemon = SigninDaemon(args.accounts_file, args.window, args.delay, args.concurrency)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, daemon.reload)
+    daemon.run()
+
+
+if __name__ == "__main__":
+    main()
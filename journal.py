@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from pytz import timezone
+
+# 表示整个账号当天已完成的版块标记
+ACCOUNT_DONE = "*"
+
+
+def today() -> str:
+    # 签到按北京时间零点重置
+    return datetime.now(timezone('Asia/Shanghai')).strftime("%Y-%m-%d")
+
+
+class RunJournal:
+    """
+    只追加的签到断点记录，每天一个 JSONL 文件，记录已完成的（账号, 版块）。
+    每条记录写入后立即落盘；同一天重新运行时跳过已完成的账号和版块，不再发送任何请求。
+    单行追加写入是原子的，多个进程可以同时写同一个文件。
+    """
+    def __init__(self, directory: str = "journal"):
+        """
+        :param directory: 记录文件所在目录
+        """
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.date = None
+        self.done = set()
+        self.file = None
+
+    def _path(self, date: str) -> str:
+        return os.path.join(self.directory, f"{date}.jsonl")
+
+    def _ensure_date(self):
+        # 跨过零点后切换到新一天的文件，并加载当天已有的记录
+        date = today()
+        if date == self.date:
+            return
+        if self.file:
+            self.file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        done = set()
+        path = self._path(date)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 进程被杀时最后一行可能不完整，忽略即可
+                        continue
+                    done.add((entry["account"], entry["board"]))
+        self.date = date
+        self.done = done
+        self.file = open(path, "a", encoding="utf-8")
+
+    def account_done(self, account: str) -> bool:
+        with self.lock:
+            self._ensure_date()
+            return (account, ACCOUNT_DONE) in self.done
+
+    def board_done(self, account: str, cat_id: str) -> bool:
+        with self.lock:
+            self._ensure_date()
+            return (account, cat_id) in self.done
+
+    def record(self, account: str, cat_id: str, result: str, exp: int = 0):
+        """
+        记录一个已完成的版块（或用 ACCOUNT_DONE 记录整个账号）
+        :param result: signed 本次签到成功，already 之前已签到，done 账号完成
+        :param exp: 本次获得的经验值
+        """
+        entry = {"account": account, "board": cat_id, "result": result, "exp": exp, "ts": round(time.time(), 3)}
+        with self.lock:
+            self._ensure_date()
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.done.add((account, cat_id))
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+                self.date = None
@@ -0,0 +1,172 @@
+"""
+多节点协同签到：多个签到任务（多个 Actions 任务或多台机器）共用同一个账号列表时，
+通过共享的 SQLite 文件按批认领账号，同一时间每个账号只由一个节点签到。
+认领带有效期，签到过程中定期续期；节点异常退出时租约过期，账号可被其他节点认领。
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from journal import today
+from logger import logger
+
+
+class LeaseManager:
+    """
+    账号租约。每个账号一行：持有者、到期时间，以及当天是否已完成。
+    当天已完成或被其他节点持有且未到期的账号不会被认领。线程安全。
+    """
+    def __init__(self, path: str, owner: str = None, ttl: float = 300, batch_size: int = 20):
+        """
+        :param path: 共享的租约数据库文件
+        :param owner: 本节点的标识，默认为 主机名-进程号
+        :param ttl: 租约有效期（秒），期间每 ttl/3 秒续期一次
+        :param batch_size: 每次认领的账号数
+        """
+        self.path = path
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}"
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.held = set()
+        self.stats = {"claimed": 0, "held_elsewhere": 0, "done_elsewhere": 0, "claim_failed": 0}
+        self.stopping = threading.Event()
+        self.thread = None
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS leases "
+                         "(account TEXT PRIMARY KEY, owner TEXT, expires_at REAL, done_date TEXT)")
+
+    @classmethod
+    def from_env(cls, batch_size: int = 20):
+        """
+        环境变量 LEASE_DB 指定共享的租约数据库时启用，否则返回 None
+        :param batch_size: 每次认领的账号数，一般取并发数，避免认领了暂时签不到的账号让其他节点空等
+        """
+        path = os.getenv('LEASE_DB')
+        if not path:
+            return None
+        return cls(path, owner=os.getenv('NODE_ID') or None, ttl=float(os.getenv('LEASE_TTL', '300')),
+                   batch_size=batch_size)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            # 使用回滚日志而非 WAL，多台机器通过共享目录访问同一文件时也能加锁
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self.local.conn = conn
+        return conn
+
+    def claim(self, accounts: list) -> list:
+        """
+        在一个事务内认领一批账号
+        :param accounts: [(账号, 密码), ...]
+        :return: 认领成功的账号
+        """
+        now = time.time()
+        date = today()
+        claimed = []
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for acc in accounts:
+                row = conn.execute("SELECT owner, expires_at, done_date FROM leases WHERE account = ?",
+                                   (acc[0],)).fetchone()
+                if row and row[2] == date:
+                    self.stats["done_elsewhere"] += 1
+                    continue
+                if row and row[0] and row[0] != self.owner and row[1] > now:
+                    self.stats["held_elsewhere"] += 1
+                    continue
+                conn.execute("INSERT OR REPLACE INTO leases (account, owner, expires_at, done_date) VALUES (?, ?, ?, ?)",
+                             (acc[0], self.owner, now + self.ttl, row[2] if row else None))
+                claimed.append(acc)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self.lock:
+            self.held.update(acc[0] for acc in claimed)
+            self.stats["claimed"] += len(claimed)
+        return claimed
+
+    def _claim_batch(self, batch: list, attempts: int = 3) -> list:
+        # 共享文件长时间被其他节点锁住时重试几次，仍失败则跳过这一批，由其他节点或下次运行签到
+        for attempt in range(1, attempts + 1):
+            try:
+                return self.claim(batch)
+            except sqlite3.OperationalError as e:
+                logger.warning(f"认领账号失败（{e}），第 {attempt} 次")
+        logger.error(f"认领账号连续 {attempts} 次失败，跳过 {len(batch)} 个账号")
+        with self.lock:
+            self.stats["claim_failed"] += len(batch)
+        return []
+
+    def claim_stream(self, accounts):
+        """
+        从账号流中按批认领，逐个产出本节点认领到的账号。认领会等待共享文件的锁，应在线程中迭代
+        """
+        batch = []
+        for acc in accounts:
+            batch.append(acc)
+            if len(batch) >= self.batch_size:
+                yield from self._claim_batch(batch)
+                batch = []
+        if batch:
+            yield from self._claim_batch(batch)
+
+    def renew(self):
+        """
+        为本节点持有的所有租约续期
+        """
+        with self.lock:
+            held = list(self.held)
+        if not held:
+            return
+        expires_at = time.time() + self.ttl
+        with self._conn() as conn:
+            conn.executemany("UPDATE leases SET expires_at = ? WHERE account = ? AND owner = ?",
+                             [(expires_at, account, self.owner) for account in held])
+
+    def complete(self, account: str, done: bool):
+        """
+        账号签到结束后释放租约
+        :param done: 当天是否已全部完成；未完成时其他节点可以重新认领
+        """
+        with self.lock:
+            self.held.discard(account)
+        try:
+            with self._conn() as conn:
+                conn.execute("UPDATE leases SET owner = NULL, expires_at = 0, done_date = COALESCE(?, done_date) "
+                             "WHERE account = ? AND owner = ?", (today() if done else None, account, self.owner))
+        except sqlite3.OperationalError as e:
+            # 不再续期，租约到期后其他节点可以重新认领
+            logger.warning(f"释放账号 {account} 的租约失败：{e}")
+
+    def start(self):
+        """
+        启动后台续期线程
+        """
+        def run():
+            while not self.stopping.wait(self.ttl / 3):
+                try:
+                    self.renew()
+                except sqlite3.Error as e:
+                    logger.warning(f"租约续期失败：{e}")
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """
+        停止续期并释放尚未签到的账号
+        """
+        self.stopping.set()
+        with self.lock:
+            held, self.held = list(self.held), set()
+        if held:
+            with self._conn() as conn:
+                conn.executemany("UPDATE leases SET owner = NULL, expires_at = 0 WHERE account = ? AND owner = ?",
+                                 [(account, self.owner) for account in held])
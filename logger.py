@@ -1,27 +1,116 @@
+import atexit
+import contextvars
+import json
 import logging
-from pytz import timezone
+import os
+import queue
+import time
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 
+from pytz import timezone
 
-# 修复时区
-def Shanghai(sec, what):
-    tz = timezone('Asia/Shanghai')
-    timenow = datetime.now(tz)
-    return timenow.timetuple()
+TZ = timezone('Asia/Shanghai')
 
+# 当前日志所属的账号和版块，随签到任务的上下文传递（asyncio.to_thread 会复制上下文）
+log_account = contextvars.ContextVar('log_account', default=None)
+log_board = contextvars.ContextVar('log_board', default=None)
 
-logging.Formatter.converter = Shanghai
 
-# 创建logger对象
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)  # log等级总开关
+def set_log_context(account=None, board=None):
+    """
+    设置之后的日志所属的账号和版块，结构化日志中会输出这两个字段
+    """
+    log_account.set(account)
+    log_board.set(board)
+
+
+class ShanghaiConverter:
+    """
+    把日志记录自身的时间戳转换为北京时间。时区偏移按小时缓存，不必为每条日志查询时区
+    """
+    def __init__(self, tz=TZ):
+        self.tz = tz
+        self.hour = None
+        self.offset = 0
+
+    def __call__(self, sec):
+        hour = int(sec // 3600)
+        if hour != self.hour:
+            self.offset = datetime.fromtimestamp(sec, self.tz).utcoffset().total_seconds()
+            self.hour = hour
+        return time.gmtime(sec + self.offset)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, fmt="%(asctime)s [%(levelname)s]:  %(message)s"):
+        super().__init__(fmt)
+        self.converter = ShanghaiConverter()
+
 
-formatter = logging.Formatter("%(asctime)s [%(levelname)s]:  %(message)s")
+class JsonFormatter(logging.Formatter):
+    """
+    每条日志输出为一行 JSON，包含时间、等级、账号、版块和消息
+    """
+    def __init__(self):
+        super().__init__()
+        self.converter = ShanghaiConverter()
 
-# 控制台handler
-stream_handler = logging.StreamHandler()
-stream_handler.setLevel(logging.INFO)  # log等级的开关
-stream_handler.setFormatter(formatter)
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "account": getattr(record, "account", None),
+            "board": getattr(record, "board", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
 
-# 添加到logger
-logger.addHandler(stream_handler)
+
+class ContextQueueHandler(QueueHandler):
+    """
+    在调用方线程只记下账号、版块并把日志放入队列，格式化和输出都由后台线程完成
+    """
+    def prepare(self, record):
+        record.account = log_account.get()
+        record.board = log_board.get()
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # 异常对象不一定能跨线程安全保留，提前转成文本
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(log_format=None, level=None):
+    """
+    配置日志：调用方只把日志放入队列，由后台线程格式化后输出到控制台，不阻塞签到请求
+    :param log_format: text 或 json，默认读取环境变量 LOG_FORMAT
+    :param level: 日志等级，默认读取环境变量 LOG_LEVEL
+    :return: QueueListener，程序退出时自动停止并输出剩余日志
+    """
+    log_format = log_format or os.getenv('LOG_FORMAT', 'text')
+    level = level or os.getenv('LOG_LEVEL', 'INFO').upper()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.setLevel(level)  # log等级总开关
+    logger.addHandler(ContextQueueHandler(log_queue))
+    logger.propagate = False
+    return listener
+
+
+# 创建logger对象
+logger = logging.getLogger(__name__)
+listener = setup_logging()
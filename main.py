@@ -1,31 +1,228 @@
-import time
-from signin import HuluxiaSignin
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import multiprocessing
 import os
+from accounts import AccountSource
+from signin import signin_accounts, default_metrics, request_timeout, base_url, run_journal
+from leases import LeaseManager
+from egress import EgressPool
+from metrics import Metrics
+from notifier import get_notifier
+from profiling import Profiler
 from logger import logger
 
-# 检查环境变量
-accounts_str = os.getenv('ACCOUNTS')
-if not accounts_str:
-    logger.error("环境变量 ACCOUNTS 未设置")
-    raise ValueError("环境变量 ACCOUNTS 未设置")
 
-# 解析账号信息，去除空行和异常格式
-accounts = []
-for acc in accounts_str.split('\n'):
+def shard_of(account, total):
+    """
+    按账号的稳定哈希分片，同一账号每次都落在同一个分片
+    """
+    return int(hashlib.md5(account.encode()).hexdigest(), 16) % total
+
+
+def iter_shard(accounts, index, total):
+    """
+    从账号流中逐个筛出属于第 index 个分片的账号
+    """
+    return (acc for acc in accounts if shard_of(acc[0], total) == index)
+
+
+def run_shard(accounts, concurrency, start_interval, workers=1, notifier=None, profile_dir=None):
+    """
+    在当前进程内并发签到一组账号
+    :param accounts: 可迭代的 (账号, 密码)，按需逐个读取
+    :param workers: 同时运行的进程数，每个出口的请求速率上限按进程数均分
+    :param notifier: 通知分发器。传入时每个账号签到结束后立即输出日志并放入通知队列，不再保存结果
+    :param profile_dir: 性能分析结果目录，指定时逐账号记录 CPU、调用栈、内存和各类等待耗时
+    :return: ([(账号, 是否成功, 签到结果), ...], 指标字典)
+    """
+    egress = EgressPool.from_env(pool_maxsize=concurrency, timeout=request_timeout, processes=workers, health_url=base_url)
+    # 设置 LEASE_DB 时与其他节点协同，只签到本节点认领到的账号
+    leases = LeaseManager.from_env(batch_size=concurrency)
+    if leases:
+        accounts = leases.claim_stream(accounts)
+        leases.start()
+    profiler = Profiler(profile_dir) if profile_dir else None
+
+    def on_result(acc, result):
+        ok = not isinstance(result, Exception)
+        if leases:
+            leases.complete(acc, done=run_journal.account_done(acc))
+        if notifier:
+            log_result(acc, ok, str(result))
+            notifier.send(format_result(acc, ok, str(result)))
+
     try:
-        phone, password = acc.split(',')
-        accounts.append((phone.strip(), password.strip()))
-    except ValueError:
-        logger.warning(f"账号信息格式不正确：{acc}")
+        results = asyncio.run(signin_accounts(accounts, concurrency=concurrency, start_interval=start_interval,
+                                              egress=egress, on_result=on_result, collect=notifier is None,
+                                              profiler=profiler))
+    finally:
+        egress.close()
+        if profiler:
+            total = profiler.close()
+            logger.info(f"性能分析结果已写入 {profile_dir}：共 {total['accounts']} 个账号，总耗时 {total['wall_seconds']:.1f}s，"
+                        f"网络 {total['network_seconds']:.1f}s，等待 {total['sleep_seconds']:.1f}s，"
+                        f"CPU {total['cpu_seconds']:.1f}s")
+        if leases:
+            leases.close()
+            logger.info(f"认领账号 {leases.stats['claimed']} 个，其他节点正在签到 {leases.stats['held_elsewhere']} 个，"
+                        f"今日已由其他节点完成 {leases.stats['done_elsewhere']} 个，认领失败跳过 {leases.stats['claim_failed']} 个")
+            for name, n in leases.stats.items():
+                default_metrics.incr(f'lease_{name}', n)
+    # 异常对象不一定能跨进程传递，统一转成文本
+    results = [(acc, not isinstance(r, Exception), str(r)) for acc, r in results]
+    return results, default_metrics.to_dict()
+
+
+def run_source_shard(path, index, total, concurrency, start_interval):
+    """
+    在子进程中读取账号来源，只签到属于第 index 个分片的账号
+    """
+    accounts = iter_shard(AccountSource.from_env(path), index, total)
+    return run_shard(accounts, concurrency, start_interval, total)
 
-# 实例化 HuluxiaSignin 类
-huluxia_signin_obj = HuluxiaSignin()
 
-# 遍历账号进行签到
-for phone, password in accounts:
+def run_workers(path, workers, concurrency, start_interval):
+    """
+    将账号按哈希分到多个进程中签到，合并各进程的结果。
+    每个进程各自读取账号来源并筛出自己的分片，主进程不保存账号列表
+    """
+    # 使用 spawn 启动子进程，避免复制父进程中已打开的 SQLite 连接；每个进程只跑一个分片，指标互不混入
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(workers, maxtasksperchild=1) as pool:
+        outputs = pool.starmap(run_source_shard,
+                               [(path, i, workers, concurrency, start_interval) for i in range(workers)])
+    results, metrics = [], Metrics()
+    for shard_results, shard_metrics in outputs:
+        results.extend(shard_results)
+        metrics.merge(shard_metrics)
+    return results, metrics
+
+
+def load_shard_outputs(shard_dir):
+    """
+    读取 GitHub Actions 矩阵中各分片写出的结果文件并合并
+    """
+    results, metrics = [], Metrics()
+    for path in sorted(glob.glob(os.path.join(shard_dir, 'shard-*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            output = json.load(f)
+        results.extend(tuple(r) for r in output['results'])
+        metrics.merge(output['metrics'])
+    return results, metrics
+
+
+def format_result(acc, ok, text):
+    return text if ok else f"账号 {acc} 签到失败：{text}\n"
+
+
+def create_notifier():
+    """
+    根据环境变量 NOTIFIER_TYPE 创建通知分发器，多个渠道用逗号分隔；配置有误时不发送通知
+    """
+    notifier_type = os.getenv('NOTIFIER_TYPE') or 'none'
+    config = {"webhook_url": os.getenv('WECHAT_ROBOT_URL')}
     try:
-        huluxia_signin_obj.huluxia_signin(phone, password)
-        logger.info(f"账号 {phone} 签到成功")
+        if os.getenv('EMAIL_CONFIG'):
+            config.update(json.loads(os.getenv('EMAIL_CONFIG')))
+        return get_notifier(notifier_type, config)
     except Exception as e:
-        logger.error(f"账号 {phone} 签到失败: {e}")
-    time.sleep(60)  # 每次签到间隔60秒
+        logger.error(f"创建通知器失败：{e}")
+        return get_notifier('none', config)
+
+
+def notify(notifier, results):
+    """
+    把所有账号的签到结果合并成一条摘要放入通知队列，多进程和分片汇总时只发送一次通知
+    """
+    if results:
+        notifier.send("\n".join(format_result(acc, ok, text) for acc, ok, text in results))
+
+
+def log_result(phone, ok, text):
+    if not ok:
+        logger.error(f"账号 {phone} 签到失败: {text}")
+    else:
+        logger.info(f"账号 {phone} 签到成功")
+
+
+def report(results, metrics):
+    for phone, ok, text in results:
+        log_result(phone, ok, text)
+    # 写出本次运行的指标报告（JSON 和 Prometheus textfile）
+    metrics.write_report(os.getenv('METRICS_JSON', 'metrics.json'), os.getenv('METRICS_PROM', 'metrics.prom'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="葫芦侠三楼每日签到")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WORKERS', '1')),
+                        help="本机签到进程数，账号按哈希分配到各进程")
+    parser.add_argument('--shard', help="只签到第 i 个分片（格式 i/n，i 从 0 开始），结果写入 --shard-dir，用于 Actions 矩阵")
+    parser.add_argument('--merge', action='store_true', help="合并 --shard-dir 中各分片的结果，写出报告并发送一次通知")
+    parser.add_argument('--shard-dir', default='shards', help="分片结果目录")
+    parser.add_argument('--accounts-file', default=os.getenv('ACCOUNTS_FILE'),
+                        help="账号文件，每行 手机号,密码 或一个 JSON 对象（JSONL），- 表示从标准输入读取")
+    parser.add_argument('--profile', nargs='?', const='profile', metavar='DIR',
+                        help="性能分析模式：逐账号记录 CPU 调用统计、调用栈采样、内存分配和网络/等待耗时，写入 DIR（默认 profile）")
+    args = parser.parse_args()
+
+    if args.merge:
+        results, metrics = load_shard_outputs(args.shard_dir)
+        report(results, metrics)
+        notifier = create_notifier()
+        notify(notifier, results)
+        notifier.close()
+        return
+
+    # 检查账号来源
+    source = AccountSource.from_env(args.accounts_file)
+    if not source.sources:
+        logger.error("未设置账号：请设置环境变量 ACCOUNTS、HULUXIA_ACCOUNTS 或 ACCOUNTS_FILE")
+        raise ValueError("未设置账号")
+
+    # 并发签到的账号数，以及相邻账号开始签到的最小间隔（秒）
+    concurrency = int(os.getenv('CONCURRENCY', '4'))
+    start_interval = float(os.getenv('ACCOUNT_INTERVAL', '5'))
+
+    if args.shard:
+        index, total = (int(n) for n in args.shard.split('/'))
+        logger.info(f"分片 {index}/{total}：并发数 {concurrency}")
+        profile_dir = os.path.join(args.profile, f'shard-{index}') if args.profile else None
+        results, metrics = run_shard(iter_shard(source, index, total), concurrency, start_interval,
+                                     profile_dir=profile_dir)
+        logger.info(f"分片 {index}/{total}：共 {len(results)} 个账号")
+        os.makedirs(args.shard_dir, exist_ok=True)
+        with open(os.path.join(args.shard_dir, f'shard-{index}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'metrics': metrics}, f, ensure_ascii=False)
+        return
+
+    if args.workers > 1 and source.from_stdin:
+        # 标准输入只能读一次，无法由多个进程分别读取
+        raise ValueError("从标准输入读取账号时不支持多进程，请使用账号文件")
+    if args.workers > 1 and args.profile:
+        # cProfile 和 tracemalloc 只能观察当前进程
+        raise ValueError("性能分析模式不支持多进程，请使用 --workers 1")
+
+    logger.info(f"进程数 {args.workers}，每个进程并发数 {concurrency}")
+    notifier = create_notifier()
+    if args.workers > 1:
+        results, metrics = run_workers(args.accounts_file, args.workers, concurrency, start_interval)
+        notify(notifier, results)
+        report(results, metrics)
+        logger.info(f"共 {len(results)} 个账号")
+    else:
+        # 单进程时边读取账号边签到，每个账号签到结束就输出日志并放入通知队列，后台发送，不阻塞签到
+        _, metrics_dict = run_shard(source, concurrency, start_interval, notifier=notifier, profile_dir=args.profile)
+        metrics = Metrics()
+        metrics.merge(metrics_dict)
+        report([], metrics)
+        stats = source.stats
+        logger.info(f"共 {stats['accounts']} 个账号，跳过格式错误 {stats['invalid']} 个、重复 {stats['duplicates']} 个")
+    # 只在退出前等待尚未发送完的通知
+    notifier.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+# 请求延迟直方图的分桶上界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class EndpointStats:
+    """
+    单个接口的请求统计
+    """
+    def __init__(self):
+        self.count = 0
+        self.http_status = Counter()
+        self.api_status = Counter()
+        self.latency_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    def observe(self, http_status, api_status, latency: float, bytes_out: int, bytes_in: int):
+        self.count += 1
+        self.http_status[str(http_status)] += 1
+        self.api_status[str(api_status)] += 1
+        self.latency_sum += latency
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[i] += 1
+                break
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "http_status": dict(self.http_status),
+            "api_status": dict(self.api_status),
+            "latency_sum": round(self.latency_sum, 6),
+            "latency_buckets": dict(zip((str(b) for b in LATENCY_BUCKETS), self.buckets)),
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+        }
+
+    def merge(self, data: dict):
+        self.count += data["count"]
+        self.http_status.update(data["http_status"])
+        self.api_status.update(data["api_status"])
+        self.latency_sum += data["latency_sum"]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            self.buckets[i] += data["latency_buckets"].get(str(bound), 0)
+        self.bytes_out += data["bytes_out"]
+        self.bytes_in += data["bytes_in"]
+
+
+class Metrics:
+    """
+    签到过程的指标收集：按接口统计请求数、状态码、延迟直方图和流量，
+    并区分主动等待（节奏控制、重试退避、账号间隔）和网络耗时。线程安全。
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.sleeps = Counter()
+        self.counters = Counter()
+        self.started_at = time.time()
+
+    def observe(self, endpoint: str, http_status, api_status, latency: float, bytes_out: int = 0, bytes_in: int = 0):
+        """
+        记录一次请求
+        :param endpoint: 接口名，如 account/login、user/signin/check
+        :param http_status: HTTP 状态码，网络异常时为异常类名
+        :param api_status: 响应中的 status 字段
+        :param latency: 请求耗时（秒）
+        """
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.observe(http_status, api_status, latency, bytes_out, bytes_in)
+
+    def sleep(self, reason: str, seconds: float):
+        """
+        记录一次主动等待
+        :param reason: 等待原因，如 pacer、retry、circuit、account_start
+        """
+        if seconds > 0:
+            with self.lock:
+                self.sleeps[reason] += seconds
+
+    def incr(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] += n
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            endpoints = {name: stats.to_dict() for name, stats in self.endpoints.items()}
+            network = sum(stats.latency_sum for stats in self.endpoints.values())
+            return {
+                "started_at": self.started_at,
+                "duration": round(time.time() - self.started_at, 3),
+                "network_seconds": round(network, 6),
+                "sleep_seconds": {k: round(v, 6) for k, v in self.sleeps.items()},
+                "counters": dict(self.counters),
+                "endpoints": endpoints,
+            }
+
+    def merge(self, data: dict):
+        """
+        合并另一份 to_dict() 导出的指标，用于汇总多个进程的结果
+        """
+        with self.lock:
+            self.started_at = min(self.started_at, data["started_at"])
+            self.sleeps.update(data["sleep_seconds"])
+            self.counters.update(data["counters"])
+            for name, stats in data["endpoints"].items():
+                self.endpoints.setdefault(name, EndpointStats()).merge(stats)
+
+    def to_prometheus(self) -> str:
+        """
+        导出为 Prometheus textfile 格式，同一指标的样本集中在一起输出
+        """
+        data = self.to_dict()
+        families = {
+            "huluxia_requests_total": ("counter", []),
+            "huluxia_api_status_total": ("counter", []),
+            "huluxia_request_duration_seconds": ("histogram", []),
+            "huluxia_request_bytes_total": ("counter", []),
+            "huluxia_sleep_seconds_total": ("counter", []),
+            "huluxia_network_seconds_total": ("counter", []),
+            "huluxia_run_counter_total": ("counter", []),
+            "huluxia_run_duration_seconds": ("gauge", []),
+            "huluxia_run_timestamp_seconds": ("gauge", []),
+        }
+
+        def add(family, sample):
+            families[family][1].append(sample)
+
+        for name, stats in sorted(data["endpoints"].items()):
+            for code, n in sorted(stats["http_status"].items()):
+                add("huluxia_requests_total", f'huluxia_requests_total{{endpoint="{name}",code="{code}"}} {n}')
+            for status, n in sorted(stats["api_status"].items()):
+                add("huluxia_api_status_total", f'huluxia_api_status_total{{endpoint="{name}",status="{status}"}} {n}')
+            cumulative = 0
+            for bound in LATENCY_BUCKETS:
+                cumulative += stats["latency_buckets"][str(bound)]
+                le = "+Inf" if bound == float("inf") else bound
+                add("huluxia_request_duration_seconds",
+                    f'huluxia_request_duration_seconds_bucket{{endpoint="{name}",le="{le}"}} {cumulative}')
+            add("huluxia_request_duration_seconds",
+                f'huluxia_request_duration_seconds_sum{{endpoint="{name}"}} {stats["latency_sum"]}')
+            add("huluxia_request_duration_seconds",
+                f'huluxia_request_duration_seconds_count{{endpoint="{name}"}} {stats["count"]}')
+            for direction in ("out", "in"):
+                add("huluxia_request_bytes_total",
+                    f'huluxia_request_bytes_total{{endpoint="{name}",direction="{direction}"}} {stats["bytes_" + direction]}')
+        for reason, seconds in sorted(data["sleep_seconds"].items()):
+            add("huluxia_sleep_seconds_total", f'huluxia_sleep_seconds_total{{reason="{reason}"}} {seconds}')
+        add("huluxia_network_seconds_total", f"huluxia_network_seconds_total {data['network_seconds']}")
+        for name, n in sorted(data["counters"].items()):
+            add("huluxia_run_counter_total", f'huluxia_run_counter_total{{name="{name}"}} {n}')
+        add("huluxia_run_duration_seconds", f"huluxia_run_duration_seconds {data['duration']}")
+        add("huluxia_run_timestamp_seconds", f"huluxia_run_timestamp_seconds {data['started_at']:.0f}")
+
+        lines = []
+        for family, (kind, samples) in families.items():
+            if samples:
+                lines.append(f"# TYPE {family} {kind}")
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, json_path: str = None, prom_path: str = None):
+        """
+        写出运行报告（JSON 和 Prometheus textfile），先写临时文件再替换，避免采集到写了一半的文件
+        """
+        if json_path:
+            _atomic_write(json_path, json.dumps(self.to_dict(), ensure_ascii=False, indent=4))
+        if prom_path:
+            _atomic_write(prom_path, self.to_prometheus())
+
+
+def _atomic_write(path: str, content: str):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
@@ -0,0 +1,233 @@
+"""
+本地模拟的 floor.huluxia.com 服务器，用于性能测试。
+
+实现登录、用户信息、签到检测、签到和版块列表接口，响应格式与线上一致，
+可配置延迟、错误率、限流和令牌有效期。
+
+用法：
+    python mock_server.py --port 8080 --latency 0.05 --error-rate 0.01
+    HULUXIA_BASE_URL=http://127.0.0.1:8080 python main.py
+
+使用 --proxies N 时额外监听 N 个端口，可作为 HTTP 代理填入 EGRESS（收到代理请求直接当作服务器处理），
+每个监听端口相当于一个独立的出口 IP，限流按端口分别计算。
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class MockConfig:
+    """
+    模拟服务器的行为配置
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 risk_rate: float = 0.0, rate_limit: float = 0.0, token_ttl: float = 0.0,
+                 boards: dict = None):
+        """
+        :param latency: 每个请求的基础延迟（秒）
+        :param jitter: 延迟的随机浮动（秒）
+        :param error_rate: 返回 HTTP 500 的概率
+        :param risk_rate: 签到检测返回 status 0（模拟风控）的概率
+        :param rate_limit: 每个来源（监听端口）每秒允许的请求数，超出返回 HTTP 429，0 表示不限流
+        :param token_ttl: 令牌有效期（秒），过期后返回未登录，0 表示永不过期
+        :param boards: 版块列表 {cat_id: 版块名}，默认读取 cat_id.json
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.risk_rate = risk_rate
+        self.rate_limit = rate_limit
+        self.token_ttl = token_ttl
+        if boards is None:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "cat_id.json"), encoding="utf-8") as f:
+                boards = json.load(f)
+        self.boards = boards
+
+
+class MockState:
+    """
+    模拟服务器的数据：令牌、签到记录和请求统计。线程安全。
+    """
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.users = {}
+        self.signed = set()
+        self.stats = Counter()
+        # 每个来源的限流窗口：{来源: [窗口开始时间, 窗口内请求数]}
+        self.windows = {}
+
+    def count(self, name: str):
+        with self.lock:
+            self.stats[name] += 1
+
+    def allow(self, source=None) -> bool:
+        # 按来源、1 秒窗口计数的简单限流
+        if not self.config.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            window = self.windows.setdefault(source, [0.0, 0])
+            if now - window[0] >= 1:
+                window[0], window[1] = now, 0
+            window[1] += 1
+            return window[1] <= self.config.rate_limit
+
+    def login(self, account: str) -> dict:
+        with self.lock:
+            user_id = self.users.setdefault(account, len(self.users) + 1)
+            _key = hashlib.md5(f"{account}{time.time()}{random.random()}".encode()).hexdigest().upper()
+            self.tokens[_key] = (account, time.time())
+        return {"status": 1, "_key": _key, "user": {"userID": user_id, "nick": account}}
+
+    def account_of(self, _key: str):
+        with self.lock:
+            token = self.tokens.get(_key)
+        if not token:
+            return None
+        account, issued = token
+        if self.config.token_ttl and time.time() - issued > self.config.token_ttl:
+            return None
+        return account
+
+    @staticmethod
+    def today() -> str:
+        # 与线上一致，按北京时间零点重置
+        return time.strftime("%Y-%m-%d", time.gmtime(time.time() + 8 * 3600))
+
+    def signin(self, account: str, cat_id: str) -> bool:
+        key = (account, cat_id, self.today())
+        with self.lock:
+            if key in self.signed:
+                return False
+            self.signed.add(key)
+            return True
+
+    def is_signed(self, account: str, cat_id: str) -> bool:
+        with self.lock:
+            return (account, cat_id, self.today()) in self.signed
+
+
+NOT_LOGGED_IN = {"status": 0, "code": 103, "msg": "未登录"}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: MockState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _params(self) -> dict:
+        params = parse_qs(urlsplit(self.path).query)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            params.update(parse_qs(self.rfile.read(length).decode()))
+        return {k: v[0] for k, v in params.items()}
+
+    def _handle(self):
+        state = self.state
+        config = state.config
+        path = urlsplit(self.path).path
+        params = self._params()
+        state.count(path)
+        if config.latency or config.jitter:
+            time.sleep(max(0.0, config.latency + random.uniform(-config.jitter, config.jitter)))
+        state.count(f"port:{self.server.server_port}")
+        if not state.allow(self.server.server_port):
+            state.count("429")
+            return self._send(429, {"status": 0, "msg": "请求过于频繁"})
+        if random.random() < config.error_rate:
+            state.count("500")
+            return self._send(500, {"status": 0, "msg": "服务器错误"})
+
+        if path == "/account/login/IOS/1.0":
+            if not params.get("email") or not params.get("password"):
+                return self._send(200, {"status": 0, "code": 104, "msg": "账号或密码错误"})
+            return self._send(200, state.login(params["email"]))
+        if path == "/category/list/IOS/1.0":
+            categories = [{"categoryID": int(k), "title": v} for k, v in (config.boards or {}).items()]
+            return self._send(200, {"status": 1, "categories": categories})
+
+        account = state.account_of(params.get("_key", ""))
+        if account is None:
+            return self._send(200, NOT_LOGGED_IN)
+        cat_id = params.get("cat_id", "")
+        if path == "/user/info/IOS/1.0":
+            return self._send(200, {"status": 1, "nick": account, "level": 5, "exp": 100, "nextExp": 500})
+        if path == "/user/signin/check/IOS/1.0":
+            if random.random() < config.risk_rate:
+                return self._send(200, {"status": 0, "code": 0, "msg": "操作过于频繁"})
+            return self._send(200, {"status": 1, "signin": int(state.is_signed(account, cat_id))})
+        if path == "/user/signin/IOS/1.1":
+            if config.boards and cat_id not in config.boards:
+                return self._send(200, {"status": 0, "code": 0, "msg": "版块不存在"})
+            if not state.signin(account, cat_id):
+                return self._send(200, {"status": 0, "code": 0, "msg": "今日已签到"})
+            return self._send(200, {"status": 1, "experienceVal": int(cat_id) % 5 + 1 if cat_id.isdigit() else 1})
+        return self._send(404, {"status": 0, "msg": "not found"})
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+
+def start_server(config: MockConfig, host: str = "127.0.0.1", port: int = 0, state: MockState = None):
+    """
+    在后台线程启动模拟服务器
+    :param state: 与已启动的服务器共享数据，用于在多个端口上监听（模拟多个出口）
+    :return: (server, state)，通过 server.server_port 获取实际端口，server.shutdown() 停止
+    """
+    state = state or MockState(config)
+    handler = type("BoundMockHandler", (MockHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟葫芦侠三楼服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="基础延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟随机浮动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500 概率")
+    parser.add_argument("--risk-rate", type=float, default=0.0, help="签到检测风控概率")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="每秒请求数上限，0 为不限")
+    parser.add_argument("--token-ttl", type=float, default=0.0, help="令牌有效期（秒），0 为永不过期")
+    parser.add_argument("--proxies", type=int, default=0, help="额外监听的端口数，可作为 HTTP 代理模拟多个出口")
+    args = parser.parse_args()
+    config = MockConfig(args.latency, args.jitter, args.error_rate, args.risk_rate, args.rate_limit, args.token_ttl)
+    server, state = start_server(config, args.host, args.port)
+    servers = [server] + [start_server(config, args.host, 0, state)[0] for _ in range(args.proxies)]
+    print(f"模拟服务器已启动：http://{args.host}:{server.server_port}")
+    if args.proxies:
+        print("EGRESS=" + ",".join(f"http://{args.host}:{s.server_port}" for s in servers[1:]))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for s in servers:
+            s.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 from abc import ABC, abstractmethod
 import os
+import queue
+import random
 import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from email.mime.text import MIMEText
 from email.header import Header
 from email.utils import formataddr
 import requests
 
+from logger import logger
+
 class Notifier(ABC):
     """
     抽象通知类，定义统一的通知接口
@@ -18,6 +25,12 @@ class Notifier(ABC):
         """
         pass
 
+    def close(self):
+        """
+        释放连接等资源
+        """
+        pass
+
 class WeChatNotifier(Notifier):
     """
     企业微信群机器人推送
@@ -26,6 +39,8 @@ class WeChatNotifier(Notifier):
         if not webhook_url:
             raise ValueError("未提供企业微信机器人 Webhook 地址")
         self.webhook_url = webhook_url
+        # 复用同一个会话的连接
+        self.session = requests.Session()
 
     def send(self, message: str):
         payload = {
@@ -36,10 +51,13 @@ class WeChatNotifier(Notifier):
                 "mentioned_mobile_list": ["@all"]
             }
         }
-        response = requests.post(url=self.webhook_url, json=payload)
+        response = self.session.post(url=self.webhook_url, json=payload, timeout=10)
         if response.status_code != 200:
             raise RuntimeError(f"企业微信通知失败，状态码 {response.status_code}：{response.text}")
 
+    def close(self):
+        self.session.close()
+
 
 class EmailNotifier(Notifier):
     """
@@ -61,6 +79,17 @@ class EmailNotifier(Notifier):
         self.auth_code_or_password = auth_code_or_password  # 可以是授权码或密码
         self.sender_email = sender_email
         self.recipient_email = recipient_email
+        self.server = None
+
+    def _connect(self):
+        # 建立 SMTP 连接并登录，之后的邮件复用该连接
+        if self.port == 465:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.port, timeout=30)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.port, timeout=30)
+            server.starttls()  # 启用 TLS
+        server.login(self.username, self.auth_code_or_password)
+        self.server = server
 
     def send(self, message: str):
         """
@@ -78,16 +107,26 @@ class EmailNotifier(Notifier):
         msg['Subject'] = Header('通知', 'utf-8')
 
         try:
-            with smtplib.SMTP_SSL(self.smtp_server, self.port) if self.port == 465 else smtplib.SMTP(self.smtp_server, self.port) as server:
-                # server.set_debuglevel(1)  # 启用调试模式
-                if self.port != 465:
-                    server.starttls()  # 启用 TLS
-                server.login(self.username, self.auth_code_or_password)
-                server.sendmail(self.sender_email, [self.recipient_email], msg.as_string())
-                server.quit()  # Ensure the server connection is properly closed
+            if self.server is None:
+                self._connect()
+            try:
+                self.server.sendmail(self.sender_email, [self.recipient_email], msg.as_string())
+            except smtplib.SMTPServerDisconnected:
+                # 复用的连接已被服务器关闭，重新连接后再发一次
+                self._connect()
+                self.server.sendmail(self.sender_email, [self.recipient_email], msg.as_string())
         except Exception as e:
+            self.close()
             raise RuntimeError(f"邮件通知失败：{e}")
 
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except smtplib.SMTPException:
+                pass
+            self.server = None
+
 class NoOpNotifier(Notifier):
     """
     无操作通知器，用于忽略通知请求
@@ -97,30 +136,114 @@ class NoOpNotifier(Notifier):
         print(f"通知被忽略：{message}")
 
 
-# 工厂函数：根据通知方式返回相应的通知器实例
-def get_notifier(method: str, config: dict) -> Notifier:
+class NotificationDispatcher(Notifier):
     """
-    根据指定的推送方式和配置，返回相应的通知实例
-    :param method: 推送方式，支持 'wechat' 或 'email'
-    :param config: 配置字典，根据不同推送方式需要提供不同配置
-    :return: Notifier 实例
+    非阻塞的通知分发器：send 只把消息放入队列，由后台线程合并成摘要，
+    并发发送到所有通知渠道，失败时指数退避重试。程序退出前调用 close 等待发送完成。
+    """
+    def __init__(self, channels: list, batch_size: int = 50, flush_interval: float = None,
+                 retries: int = 3, backoff: float = 2.0):
+        """
+        :param channels: 通知渠道（Notifier 实例）列表
+        :param batch_size: 累积多少条消息后合并发送一次
+        :param flush_interval: 最多等待多少秒就发送已累积的消息，None 表示只按条数和退出时发送
+        :param retries: 每个渠道发送失败后的重试次数
+        :param backoff: 第一次重试前的等待时间（秒），之后逐次翻倍
+        """
+        self.channels = channels
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(channels)))
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def send(self, message: str):
+        self.queue.put(message)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                message = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                message = ''
+            if message is None:
+                break
+            if message:
+                batch.append(message)
+                if deadline is None and self.flush_interval is not None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_size or (deadline and time.monotonic() >= deadline)):
+                self._deliver("\n".join(batch))
+                batch, deadline = [], None
+        if batch:
+            self._deliver("\n".join(batch))
+
+    def _deliver(self, digest: str):
+        # 各渠道并发发送，某个渠道失败不影响其他渠道
+        wait([self.executor.submit(self._send_with_retry, channel, digest) for channel in self.channels])
+
+    def _send_with_retry(self, channel: Notifier, message: str):
+        for attempt in range(self.retries + 1):
+            try:
+                channel.send(message)
+                return
+            except Exception as e:
+                if attempt >= self.retries:
+                    logger.error(f"通知发送失败（{type(channel).__name__}），已重试 {self.retries} 次：{e}")
+                    return
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.0))
+
+    def close(self, timeout: float = None):
+        """
+        发送队列中剩余的消息并等待完成，然后关闭各渠道的连接
+        """
+        self.queue.put(None)
+        self.thread.join(timeout)
+        self.executor.shutdown(wait=True)
+        for channel in self.channels:
+            channel.close()
+
+
+def create_channel(method: str, config: dict) -> Notifier:
+    """
+    根据推送方式创建单个通知渠道
     """
     if method == 'wechat':
         return WeChatNotifier(webhook_url=config.get("webhook_url"))
     elif method == 'email':
+        # 兼容旧版 EMAIL_CONFIG 的字段名（password、receiver_email）
+        sender_email = config.get("sender_email")
         return EmailNotifier(
             smtp_server=config.get("smtp_server"),
-            port=config.get("port"),
-            username=config.get("username"),
-            auth_code_or_password=config.get("auth_code_or_password"),
-            sender_email=config.get("sender_email"),
-            recipient_email=config.get("recipient_email")
+            port=int(config.get("port") or 465),
+            username=config.get("username") or sender_email,
+            auth_code_or_password=config.get("auth_code_or_password") or config.get("password"),
+            sender_email=sender_email,
+            recipient_email=config.get("recipient_email") or config.get("receiver_email")
         )
     elif method == 'none':
         return NoOpNotifier()
     else:
         raise ValueError(f"不支持的通知方式：{method}")
 
+
+# 工厂函数：根据通知方式返回相应的通知器实例
+def get_notifier(method: str, config: dict) -> Notifier:
+    """
+    根据指定的推送方式和配置，返回相应的通知实例
+    :param method: 推送方式，支持 'wechat'、'email' 或 'none'，多个渠道用逗号分隔，如 'wechat,email'
+    :param config: 配置字典，根据不同推送方式需要提供不同配置
+    :return: NotificationDispatcher 实例，send 不阻塞，退出前需调用 close
+    """
+    channels = [create_channel(m.strip(), config) for m in method.split(',') if m.strip()]
+    return NotificationDispatcher(channels)
+
 # 示例代码，用于测试通知器
 if __name__ == "__main__":
     # 环境变量配置
@@ -139,6 +262,7 @@ if __name__ == "__main__":
     try:
         notifier = get_notifier(notifier_type, config)
         notifier.send("这是一个测试通知！")
-        print("通知发送成功！")
+        notifier.close()
+        print("通知已发送！")
     except Exception as e:
         print(f"通知发送失败：{e}")
\ No newline at end of file
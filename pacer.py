@@ -0,0 +1,131 @@
+import os
+import random
+import threading
+import time
+
+
+class AimdRate:
+    """
+    AIMD（加性增、乘性减）速率控制：请求顺利时缓慢提速，失败或被风控时成倍降速
+    """
+    def __init__(self, rate: float, min_rate: float, max_rate: float, increase: float, decrease: float):
+        """
+        :param rate: 初始速率（次/秒）
+        :param min_rate: 速率下限
+        :param max_rate: 速率上限
+        :param increase: 每次成功增加的速率
+        :param decrease: 每次失败时速率乘以的系数（0~1）
+        """
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.rate = min(max(rate, min_rate), max_rate)
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.rate
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_failure(self):
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+
+
+class AdaptivePacer:
+    """
+    所有请求共享的节奏控制器。
+    全局速率限制整个进程的请求频率，单账号速率限制同一账号的请求间隔，
+    两者都会根据请求延迟和失败/风控响应自动调整。线程安全。
+    """
+    def __init__(self, max_rate: float = 10.0, account_max_rate: float = 1.0, min_rate: float = 0.1,
+                 target_latency: float = 1.0, increase: float = 0.1, decrease: float = 0.5, jitter: float = 0.3):
+        """
+        :param max_rate: 全局速率上限（次/秒）
+        :param account_max_rate: 单账号速率上限（次/秒）
+        :param min_rate: 速率下限（次/秒），降速不会低于该值
+        :param target_latency: 目标延迟（秒），超过两倍视为服务器压力过大
+        :param increase: 加性增的步长
+        :param decrease: 乘性减的系数
+        :param jitter: 单账号间隔的随机抖动比例，避免请求过于规律
+        """
+        self.account_max_rate = account_max_rate
+        self.min_rate = min_rate
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.jitter = jitter
+        self.global_rate = AimdRate(max_rate / 4, min_rate, max_rate, increase, decrease)
+        self.account_rates = {}
+        self.next_global = 0.0
+        self.next_account = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, processes: int = 1) -> "AdaptivePacer":
+        """
+        从环境变量 PACER_MAX_RATE、PACER_ACCOUNT_MAX_RATE 读取速率上限
+        :param processes: 同时签到的进程数，全局速率上限由各进程均分
+        """
+        return cls(
+            max_rate=float(os.getenv('PACER_MAX_RATE', '10')) / processes,
+            account_max_rate=float(os.getenv('PACER_ACCOUNT_MAX_RATE', '1')),
+        )
+
+    def _account_rate(self, account: str) -> AimdRate:
+        rate = self.account_rates.get(account)
+        if rate is None:
+            rate = AimdRate(self.account_max_rate / 2, self.min_rate, self.account_max_rate, self.increase, self.decrease)
+            self.account_rates[account] = rate
+        return rate
+
+    def wait(self, account: str = '', jitter_scale: float = 1.0) -> float:
+        """
+        在发送请求前调用，阻塞到允许发送为止
+        :param account: 当前请求所属账号
+        :param jitter_scale: 随机抖动的缩放比例，时间紧张时可缩短甚至取消抖动
+        :return: 实际等待的秒数
+        """
+        waited = 0.0
+        # 先等到本账号允许发送，再占用全局时隙；被降速账号的等待不推迟其他账号的请求
+        with self.lock:
+            delay = self.next_account.get(account, 0.0) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            waited += delay
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_global)
+            self.next_global = start + self.global_rate.interval
+            interval = self._account_rate(account).interval
+            self.next_account[account] = start + interval * random.uniform(1, 1 + self.jitter * jitter_scale)
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    def record(self, account: str, latency: float, ok: bool):
+        """
+        在请求完成后调用，反馈结果以调整速率
+        :param account: 请求所属账号
+        :param latency: 请求耗时（秒）
+        :param ok: 请求是否成功（网络异常、HTTP 错误或 status != 1 均视为失败）
+        """
+        with self.lock:
+            account_rate = self._account_rate(account)
+            if not ok or latency > self.target_latency * 2:
+                self.global_rate.on_failure()
+                account_rate.on_failure()
+            elif latency <= self.target_latency:
+                self.global_rate.on_success()
+                account_rate.on_success()
+
+    def forget(self, account: str):
+        """
+        账号签到结束后释放其状态
+        """
+        with self.lock:
+            self.account_rates.pop(account, None)
+            self.next_account.pop(account, None)
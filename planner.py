@@ -0,0 +1,169 @@
+"""
+按截止时间规划签到：根据历史数据估计每个版块签到获得的经验值和耗时（含等待），
+按“每秒经验值”从高到低签到；临近截止时间时缩短可省略的等待，推迟低价值版块，
+保证时间不够时丢掉的是价值最低的部分。被推迟的版块不记入断点记录，下次运行时继续签到。
+"""
+import threading
+import time
+
+# board_stats 中记录账号登录和查询用户信息耗时的保留行，不是版块
+SETUP = "_setup"
+
+
+class RunPlanner:
+    """
+    签到计划。版块的经验值和耗时用指数滑动平均估计，保存在状态库的 board_stats 表中。
+    时间进度（已用时间 / 总预算）超过 relax_at 后，可省略的等待按比例缩短，到 defer_at 时降为 0；
+    超过 defer_at 后只签到每秒经验值不低于中位数的版块；剩余时间不足以签完一个版块时全部推迟，
+    不够登录后再签完一个版块时账号不再登录。登录和查询用户信息的耗时也按滑动平均估计。线程安全。
+    """
+    def __init__(self, store, budget: float = None, alpha: float = 0.2, relax_at: float = 0.5, defer_at: float = 0.8,
+                 default_exp: float = 3.0, default_cost: float = 1.0, default_setup_cost: float = 2.0):
+        """
+        :param store: StateStore 实例
+        :param budget: 本次运行的时间预算（秒），为空时不限时间，只按价值排序
+        :param alpha: 滑动平均中新样本的权重
+        :param relax_at: 开始缩短可省略等待的时间进度
+        :param defer_at: 开始推迟低价值版块的时间进度
+        :param default_exp: 没有历史数据时版块的经验值估计
+        :param default_cost: 没有历史数据时版块的耗时估计（秒）
+        :param default_setup_cost: 没有历史数据时账号登录和查询用户信息的耗时估计（秒）
+        """
+        self.store = store
+        self.budget = budget
+        self.alpha = alpha
+        self.relax_at = relax_at
+        self.defer_at = defer_at
+        self.default_exp = default_exp
+        self.default_cost = default_cost
+        self.default_setup_cost = default_setup_cost
+        self.started_at = None
+        self.stats = None
+        self.lock = threading.Lock()
+        store.ensure_table("board_stats", ("exp", "cost", "samples"))
+
+    def start(self):
+        """
+        开始计时，重复调用不会重置
+        """
+        with self.lock:
+            if self.started_at is None:
+                self.started_at = time.monotonic()
+
+    def _load(self) -> dict:
+        if self.stats is None:
+            self.stats = {cat_id: self.store.get("board_stats", cat_id) for cat_id in self.store.accounts("board_stats")}
+        return self.stats
+
+    def rate(self, cat_id: str) -> float:
+        """
+        :return: 版块的预计每秒经验值
+        """
+        with self.lock:
+            stats = self._load().get(cat_id)
+        exp = stats["exp"] if stats else self.default_exp
+        cost = stats["cost"] if stats else self.default_cost
+        return exp / max(cost, 1e-3)
+
+    def cost(self, cat_id: str) -> float:
+        with self.lock:
+            stats = self._load().get(cat_id)
+        return stats["cost"] if stats else self.default_cost
+
+    def setup_cost(self) -> float:
+        """
+        :return: 账号开始签到版块前（登录、查询用户信息）的预计耗时（秒）
+        """
+        with self.lock:
+            stats = self._load().get(SETUP)
+        return stats["cost"] if stats else self.default_setup_cost
+
+    def order(self, boards: dict) -> list:
+        """
+        :param boards: {cat_id: 版块名}
+        :return: 按每秒经验值从高到低排列的 [(cat_id, 版块名), ...]
+        """
+        return sorted(boards.items(), key=lambda item: self.rate(item[0]), reverse=True)
+
+    def progress(self) -> float:
+        """
+        :return: 时间进度，0 表示刚开始，1 表示已到截止时间；不限时间时始终为 0
+        """
+        if not self.budget or self.started_at is None:
+            return 0.0
+        return (time.monotonic() - self.started_at) / self.budget
+
+    def remaining(self) -> float:
+        if not self.budget or self.started_at is None:
+            return float("inf")
+        return self.budget - (time.monotonic() - self.started_at)
+
+    def delay_scale(self) -> float:
+        """
+        :return: 可省略等待（账号启动间隔、请求间隔的随机抖动）的缩放比例，0~1
+        """
+        progress = self.progress()
+        if progress <= self.relax_at:
+            return 1.0
+        return max(0.0, (self.defer_at - progress) / (self.defer_at - self.relax_at))
+
+    def should_skip_account(self, boards) -> bool:
+        """
+        判断账号是否整个推迟到下次运行：剩余时间不够登录后再签完一个版块时，不再登录
+        :param boards: 本账号尚未完成的版块 id
+        """
+        if not boards:
+            return False
+        return self.remaining() < self.setup_cost() + min(self.cost(b) for b in boards)
+
+    def should_defer(self, cat_id: str, boards) -> bool:
+        """
+        判断版块是否推迟到下次运行
+        :param boards: 本账号的全部版块 id，用于计算每秒经验值的中位数
+        """
+        if self.remaining() < self.cost(cat_id):
+            return True
+        if self.progress() < self.defer_at:
+            return False
+        rates = sorted(self.rate(b) for b in boards)
+        return self.rate(cat_id) < rates[len(rates) // 2]
+
+    def observe(self, cat_id: str, outcome: str, exp: int, seconds: float):
+        """
+        记录一次版块签到的结果和耗时（含节奏控制和重试等待）
+        :param outcome: signed、already 或 failed；只有 signed 时的经验值才计入估计
+        """
+        with self.lock:
+            stats = self._load()
+            row = stats.get(cat_id)
+            if row is None:
+                row = stats[cat_id] = {"exp": self.default_exp if outcome != 'signed' else exp,
+                                       "cost": seconds, "samples": 0}
+            else:
+                row["cost"] += self.alpha * (seconds - row["cost"])
+                if outcome == 'signed':
+                    row["exp"] += self.alpha * (exp - row["exp"])
+            row["samples"] += 1
+
+    def observe_setup(self, seconds: float):
+        """
+        记录一次账号登录和查询用户信息的耗时
+        """
+        with self.lock:
+            stats = self._load()
+            row = stats.get(SETUP)
+            if row is None:
+                stats[SETUP] = {"exp": 0, "cost": seconds, "samples": 1}
+            else:
+                row["cost"] += self.alpha * (seconds - row["cost"])
+                row["samples"] += 1
+
+    def save(self):
+        """
+        把估计值写回状态库
+        """
+        with self.lock:
+            stats = dict(self.stats or {})
+        for cat_id, row in stats.items():
+            self.store.put("board_stats", cat_id, row)
+        self.store.flush()
@@ -0,0 +1,249 @@
+"""
+性能分析模式（main.py --profile）：逐个账号记录签到过程的 CPU 调用统计、调用栈采样和内存分配，
+并把每个账号的耗时拆分为网络等待、主动等待、CPU 和其他，用于在真实负载下定位热点。
+四者之和等于总耗时：
+    network  HTTP 请求耗时中除去本线程 CPU 的部分，即等待服务器和网络的时间
+    sleep    节奏控制、重试退避等主动等待
+    cpu      本线程的 CPU 时间，其中 HTTP 请求内（组包、解析响应等）的部分另见 cpu_request
+    other    其余时间：等待锁、GIL、状态库等
+
+输出目录中的文件：
+    summary.json                每个账号及汇总的耗时拆分和内存增量
+    all.prof / <账号>.prof       cProfile 统计（python -m pstats all.prof 查看）
+    all.collapsed / <账号>.collapsed
+                                调用栈采样（折叠栈格式，可用 flamegraph.pl 或 speedscope 生成火焰图）
+    memory.txt                  运行前后内存分配差异最大的代码位置
+"""
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+
+class AccountTimer:
+    """
+    包装指标收集器：转发所有记录，同时累计单个账号的主动等待时间，以及 HTTP 请求的耗时和其中的 CPU 时间
+    """
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.network = 0.0
+        self.network_cpu = 0.0
+        self.sleeps = Counter()
+
+    def sleep(self, reason, seconds):
+        if seconds > 0:
+            self.sleeps[reason] += seconds
+        self.metrics.sleep(reason, seconds)
+
+    def __getattr__(self, name):
+        return getattr(self.metrics, name)
+
+
+class TimedTransport:
+    """
+    包装 HTTP 传输层：在发出请求的线程上记录每次请求的耗时和 CPU 时间，其余属性原样转发
+    """
+    def __init__(self, transport, timer: AccountTimer):
+        self.transport = transport
+        self.timer = timer
+
+    def request(self, *args, **kwargs):
+        cpu_start = time.thread_time()
+        start = time.perf_counter()
+        try:
+            return self.transport.request(*args, **kwargs)
+        finally:
+            self.timer.network += time.perf_counter() - start
+            self.timer.network_cpu += time.thread_time() - cpu_start
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+
+class StackSampler:
+    """
+    后台线程定期采样正在签到的线程的调用栈，按账号统计折叠栈。
+    采样的是墙钟时间，等待网络和 sleep 的栈也会出现，与 cProfile 互为补充
+    """
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.active = {}
+        self.stacks = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def attach(self, account: str):
+        with self.lock:
+            self.active[threading.get_ident()] = account
+            self.stacks.setdefault(account, Counter())
+
+    def detach(self):
+        with self.lock:
+            self.active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            frames = sys._current_frames()
+            frame = None
+            with self.lock:
+                for tid, account in self.active.items():
+                    frame = frames.get(tid)
+                    if frame is not None:
+                        self.stacks[account][collapse(frame)] += 1
+            # 不保留帧的引用，否则已结束的签到调用的局部变量无法释放
+            del frames, frame
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+
+
+def collapse(frame) -> str:
+    # 从最外层到最内层，以分号连接的 文件名:函数名
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def write_collapsed(path: str, stacks: Counter):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """
+    逐账号的性能分析器。每个账号的签到在一个线程内完成，在该线程上启用独立的 cProfile，
+    并记录线程 CPU 时间、网络耗时、主动等待和内存变化。线程安全。
+    内存变化取自 tracemalloc 的进程级统计，并发签到时包含同时进行的其他账号的分配，
+    需要单个账号的准确数据时设置 CONCURRENCY=1。
+    """
+    def __init__(self, directory: str = "profile", sample_interval: float = 0.01, memory_frames: int = 10):
+        """
+        :param directory: 输出目录
+        :param sample_interval: 调用栈采样间隔（秒）
+        :param memory_frames: tracemalloc 记录的调用栈深度
+        """
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.accounts = []
+        self.stats = None
+        self.skipped = 0
+        self.sampler = StackSampler(sample_interval)
+        os.makedirs(directory, exist_ok=True)
+        tracemalloc.start(memory_frames)
+        self.snapshot = tracemalloc.take_snapshot()
+        self.sampler.start()
+
+    def wrap(self, metrics, transport):
+        """
+        :return: (AccountTimer, TimedTransport)，传给单个账号的签到客户端
+        """
+        timer = AccountTimer(metrics)
+        return timer, TimedTransport(transport, timer)
+
+    def run(self, account: str, timer: AccountTimer, func, *args):
+        """
+        在当前线程中执行 func(*args) 并记录该账号的性能数据
+        :param timer: 传给签到客户端的 AccountTimer
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12 起同一时间只能有一个 cProfile 生效，并发签到时只记录其中一个账号
+            profile = None
+        self.sampler.attach(account)
+        mem_before = tracemalloc.get_traced_memory()[0]
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            if profile:
+                profile.disable()
+            self.sampler.detach()
+            self._record(account, profile, timer, wall, cpu, tracemalloc.get_traced_memory()[0] - mem_before)
+
+    def _record(self, account, profile, timer, wall, cpu, mem_delta):
+        name = safe_name(account)
+        sleep = sum(timer.sleeps.values())
+        # 请求耗时中的 CPU 计入 cpu，network 只保留等待部分，各项之和等于总耗时
+        network = max(0.0, timer.network - timer.network_cpu)
+        entry = {
+            "account": account,
+            "wall_seconds": round(wall, 6),
+            "network_seconds": round(network, 6),
+            "sleep_seconds": round(sleep, 6),
+            "sleeps": {k: round(v, 6) for k, v in timer.sleeps.items()},
+            "cpu_seconds": round(cpu, 6),
+            "cpu_request_seconds": round(timer.network_cpu, 6),
+            "other_seconds": round(max(0.0, wall - network - sleep - cpu), 6),
+            "process_memory_delta_bytes": mem_delta,
+            "profile": None,
+        }
+        if profile:
+            path = os.path.join(self.directory, f"{name}.prof")
+            profile.dump_stats(path)
+            entry["profile"] = os.path.basename(path)
+        with self.lock:
+            self.accounts.append(entry)
+            if profile:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+            else:
+                self.skipped += 1
+
+    def close(self) -> dict:
+        """
+        停止采样，写出汇总文件
+        :return: 汇总的耗时拆分
+        """
+        self.sampler.stop()
+        total_stacks = Counter()
+        for account, stacks in self.sampler.stacks.items():
+            write_collapsed(os.path.join(self.directory, f"{safe_name(account)}.collapsed"), stacks)
+            total_stacks.update(stacks)
+        write_collapsed(os.path.join(self.directory, "all.collapsed"), total_stacks)
+        if self.stats is not None:
+            self.stats.dump_stats(os.path.join(self.directory, "all.prof"))
+
+        # 排除分析器自身（cProfile 统计、调用栈采样）的内存分配
+        exclude = [tracemalloc.Filter(False, pattern) for pattern in (cProfile.__file__, pstats.__file__, __file__)]
+        snapshot = tracemalloc.take_snapshot().filter_traces(exclude)
+        with open(os.path.join(self.directory, "memory.txt"), "w", encoding="utf-8") as f:
+            current, peak = tracemalloc.get_traced_memory()
+            f.write(f"current={current} peak={peak}\n")
+            for stat in snapshot.compare_to(self.snapshot.filter_traces(exclude), "lineno")[:30]:
+                f.write(f"{stat}\n")
+        tracemalloc.stop()
+
+        keys = ("wall_seconds", "network_seconds", "sleep_seconds", "cpu_seconds", "cpu_request_seconds",
+                "other_seconds")
+        total = {k: round(sum(a[k] for a in self.accounts), 6) for k in keys}
+        total["accounts"] = len(self.accounts)
+        total["profiles_skipped"] = self.skipped
+        with open(os.path.join(self.directory, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump({"total": total, "accounts": self.accounts}, f, ensure_ascii=False, indent=4)
+        return total
+
+
+def safe_name(account: str) -> str:
+    # 账号用作文件名时只保留安全字符
+    return "".join(c if c.isalnum() or c in "-_.@" else "_" for c in account)
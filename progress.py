@@ -0,0 +1,118 @@
+"""
+账号等级与经验进度：记录每个账号最近一次查询到的等级和经验值，以及之后每次签到获得的经验值。
+签到时据此推算当前经验，不必每天请求用户信息接口；升级预估等统计也直接从本地记录计算。
+
+用法：
+    python progress.py            # 输出所有账号的等级、经验和预计升级天数
+"""
+import math
+import threading
+import time
+
+from journal import today
+
+
+class ProgressStore:
+    """
+    账号进度记录，保存在状态库的 progress 表中。
+    - refresh：用户信息接口返回的昵称、等级、经验值，作为推算的基准
+    - record：每次签到获得的经验值，累加到基准之上，并按天统计用于预估升级时间
+    基准超过 refresh_after 秒或推算经验已达到升级所需时，需要重新查询用户信息。线程安全。
+    """
+    def __init__(self, store, refresh_after: float = 7 * 86400):
+        """
+        :param store: StateStore 实例
+        :param refresh_after: 距上次查询用户信息超过多少秒后需要重新查询
+        """
+        self.store = store
+        self.refresh_after = refresh_after
+        self.lock = threading.Lock()
+        self.stats = {"refreshes": 0, "skipped": 0}
+        # gained 为上次查询后累计获得的经验；gain_total / gain_days 为有签到记录的天数及其总经验
+        store.ensure_table("progress", ("nick", "level", "exp", "next_exp", "refreshed_at",
+                                        "gained", "gain_total", "gain_days", "last_date"))
+
+    def get(self, account: str):
+        """
+        :return: 账号进度，exp 为推算的当前经验值；没有记录时返回 None
+        """
+        row = self.store.get("progress", account)
+        if row is None or row["refreshed_at"] is None:
+            return None
+        row["exp"] = (row["exp"] or 0) + (row["gained"] or 0)
+        return row
+
+    def needs_refresh(self, account: str) -> bool:
+        row = self.get(account)
+        if row is None or time.time() - row["refreshed_at"] > self.refresh_after:
+            return True
+        # 推算已经够升级，新等级所需经验只能从服务器获取
+        return row["next_exp"] is not None and row["exp"] >= row["next_exp"]
+
+    def refresh(self, account: str, nick: str, level, exp, next_exp):
+        """
+        保存用户信息接口返回的最新等级和经验，作为之后推算的基准
+        """
+        with self.lock:
+            self.stats["refreshes"] += 1
+            row = self.store.get("progress", account) or {}
+            row.update(nick=nick, level=level, exp=exp, next_exp=next_exp, refreshed_at=time.time(), gained=0)
+            self.store.put("progress", account, row)
+
+    def skip(self):
+        with self.lock:
+            self.stats["skipped"] += 1
+
+    def record(self, account: str, gain: int):
+        """
+        记录一次签到获得的经验值
+        """
+        with self.lock:
+            row = self.store.get("progress", account)
+            if row is None:
+                return
+            date = today()
+            if row["last_date"] != date:
+                row["gain_days"] = (row["gain_days"] or 0) + 1
+                row["last_date"] = date
+            row["gain_total"] = (row["gain_total"] or 0) + gain
+            row["gained"] = (row["gained"] or 0) + gain
+            self.store.put("progress", account, row)
+
+    def daily_gain(self, account: str):
+        """
+        :return: 平均每天签到获得的经验值，没有记录时返回 None
+        """
+        row = self.store.get("progress", account)
+        if not row or not row["gain_days"]:
+            return None
+        return row["gain_total"] / row["gain_days"]
+
+    def days_to_next_level(self, account: str):
+        """
+        按平均每天获得的经验值预估升级还需要的天数
+        :return: 天数，无法预估时返回 None
+        """
+        row = self.get(account)
+        daily = self.daily_gain(account)
+        if not row or row["next_exp"] is None or not daily:
+            return None
+        return max(0, math.ceil((row["next_exp"] - row["exp"]) / daily))
+
+
+def main():
+    from state import open_store
+
+    progress = ProgressStore(open_store())
+    for account in progress.store.accounts("progress"):
+        row = progress.get(account)
+        if row is None:
+            continue
+        daily = progress.daily_gain(account)
+        days = progress.days_to_next_level(account)
+        print(f"{account}  {row['nick']}  Lv.{row['level']}  经验 {row['exp']}/{row['next_exp']}  "
+              f"日均 {daily or 0:.0f}  预计升级 {'-' if days is None else f'{days} 天'}")
+
+
+if __name__ == "__main__":
+    main()
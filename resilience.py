@@ -0,0 +1,105 @@
+import random
+import threading
+import time
+
+import requests
+
+from logger import logger
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    熔断期间等待超时，请求未发出
+    """
+
+
+class RetryPolicy:
+    """
+    带随机抖动的指数退避重试策略
+    """
+    def __init__(self, attempts: int = 3, base: float = 0.5, cap: float = 8.0):
+        """
+        :param attempts: 最多尝试次数（含第一次）
+        :param base: 第一次重试的最大等待时间（秒）
+        :param cap: 单次等待时间上限（秒）
+        """
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt: int) -> float:
+        """
+        :param attempt: 已失败的次数（从 1 开始）
+        :return: 下一次重试前的等待时间，在 0 到退避上限之间随机取值
+        """
+        return random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+
+
+def retryable_status(status_code: int) -> bool:
+    # 429 表示被限流，5xx 表示服务器异常，均可在退避后重试
+    return status_code == 429 or status_code >= 500
+
+
+def safe_to_resend(exc: Exception) -> bool:
+    """
+    判断非幂等请求（签到）失败后能否直接重发：只有确定请求没有发出时才能重发
+    """
+    return isinstance(exc, requests.exceptions.ConnectTimeout)
+
+
+class CircuitBreaker:
+    """
+    主机级熔断器：连续失败达到阈值后熔断，冷却期内所有账号的请求都暂停等待，
+    冷却结束后放行一个探测请求，成功则恢复，失败则继续熔断。线程安全。
+    """
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0, max_wait: float = 600.0):
+        """
+        :param failure_threshold: 连续失败多少次后熔断
+        :param cooldown: 熔断冷却时间（秒）
+        :param max_wait: 单个请求最多等待熔断恢复的时间（秒），超时抛出 CircuitOpenError
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """
+        发送请求前调用，熔断期间阻塞等待
+        """
+        deadline = time.monotonic() + self.max_wait
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.state == "closed":
+                    return
+                if self.state == "open" and now >= self.opened_at + self.cooldown:
+                    # 冷却结束，当前请求作为探测请求放行
+                    self.state = "half_open"
+                    return
+                if now >= deadline:
+                    raise CircuitOpenError("服务器持续不可用，熔断等待超时")
+                wait = deadline - now
+                if self.state == "open":
+                    wait = min(wait, self.opened_at + self.cooldown - now)
+                self.condition.wait(wait)
+
+    def record_success(self):
+        with self.condition:
+            if self.state != "closed":
+                logger.info("服务器已恢复，解除熔断")
+            self.state = "closed"
+            self.failures = 0
+            self.condition.notify_all()
+
+    def record_failure(self):
+        with self.condition:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                logger.warning(f"服务器连续 {self.failures} 次请求失败，熔断 {self.cooldown:.0f} 秒")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self.condition.notify_all()
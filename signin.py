@@ -2,33 +2,26 @@ import json
 import random
 import time
 import requests
-import logging
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
-from pytz import timezone
 import os
 import hashlib
-
-# 修复时区为上海时区
-def Shanghai(sec, what):
-    tz = timezone('Asia/Shanghai')
-    timenow = datetime.now(tz)
-    return timenow.timetuple()
-
-logging.Formatter.converter = Shanghai
-
-# 日志设置
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-formatter = logging.Formatter("%(asctime)s [%(levelname)s]:  %(message)s")
-stream_handler = logging.StreamHandler()
-stream_handler.setLevel(logging.INFO)
-stream_handler.setFormatter(formatter)
-logger.addHandler(stream_handler)
+import asyncio
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from pacer import AdaptivePacer
+from metrics import Metrics
+from journal import RunJournal, ACCOUNT_DONE
+from state import open_store, TableView
+from catalog import BoardCatalog, fetch_server_boards
+from transport import Transport, AccountContext
+from egress import Egress, EgressPool
+from tokens import TokenManager, is_auth_error
+from progress import ProgressStore
+from planner import RunPlanner
+from resilience import RetryPolicy, CircuitOpenError, retryable_status, safe_to_resend
+from logger import logger, set_log_context
 
 # 静态配置
+base_url = os.getenv('HULUXIA_BASE_URL', 'https://floor.huluxia.com')  # 可指向本地模拟服务器
 platform = '1'  # IOS平台
 app_version = '1.2.2'
 market_id = 'floor_huluxia'
@@ -42,74 +35,6 @@ headers = {
     "Connection": "keep-alive"
 }
 
-# 版块信息
-cat_id_dict = {
-    "1": "3楼公告版", "2": "泳池", "3": "自拍", "4": "游戏", "6": "意见反馈",
-    "15": "葫芦山", "16": "玩机广场", "21": "穿越火线", "22": "英雄联盟", "29": "次元阁",
-    "43": "实用软件", "44": "玩机教程", "45": "原创技术", "57": "头像签名", "58": "恶搞",
-    "60": "未知版块", "63": "我的世界", "67": "MC贴子", "68": "资源审核", "69": "优秀资源",
-    "70": "福利活动", "71": "王者荣耀", "76": "娱乐天地", "81": "手机美化", "82": "3楼学院",
-    "84": "3楼精选", "92": "模型玩具", "94": "三楼活动", "96": "技术分享", "98": "制图工坊",
-    "102": "LOL手游", "107": "三两影", "108": "新游推荐", "110": "原神", "111": "Steam",
-    "115": "金铲铲之战", "119": "爱国爱党", "125": "妙易堂"
-}
-
-# 从环境变量中获取账号和密码，格式为：email:password,email:password,...
-accounts = []
-if "HULUXIA_ACCOUNTS" in os.environ:
-    accounts_env = os.environ["HULUXIA_ACCOUNTS"]
-    accounts = [tuple(acc.split(":")) for acc in accounts_env.split(",")]
-
-# 读取邮箱配置
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-def email_push(subject, content):
-    # 从环境变量获取邮件配置（JSON 格式）
-    email_config_str = os.getenv("EMAIL_CONFIG")
-    if not email_config_str:
-        logger.warning("未找到环境变量 EMAIL_CONFIG")
-        return
-    
-    try:
-        email_config = json.loads(email_config_str)
-    except json.JSONDecodeError as e:
-        logger.error(f"邮件配置 JSON 解析失败：{e}")
-        return
-    
-    # 提取必要配置项
-    required_keys = ["smtp_server", "port", "sender_email", "password", "receiver_email"]
-    missing = [key for key in required_keys if key not in email_config]
-    if missing:
-        logger.warning(f"缺少必要配置项：{', '.join(missing)}")
-        return
-    
-    # 类型转换
-    smtp_server = email_config["smtp_server"]
-    port = int(email_config["port"])
-    sender_email = email_config["sender_email"]
-    password = email_config["password"]
-    receiver_email = email_config["receiver_email"]
-    
-    try:
-        # 创建邮件对象
-        msg = MIMEMultipart
-        msg["From"] = sender_email
-        msg["To"] = receiver_email
-        msg["Subject"] = subject
-        msg.attach(MIMEText(content, "plain"))
-        
-        # 发送邮件
-        with smtplib.SMTP_SSL(smtp_server, port) as server:
-            server.login(sender_email, password)
-            server.sendmail(sender_email, receiver_email, msg.as_string)
-        logger.info("邮件推送成功")
-        
-    except smtplib.SMTPException as e:
-        logger.error(f"SMTP 错误：{e}")
-    except Exception as e:
-        logger.error(f"未知错误：{e}")
-
 # ------------------------------
 # 设备随机配置及配置文件操作
 # ------------------------------
@@ -122,77 +47,196 @@ def generate_random_device_config():
     phone_brand_type = random.choice(phone_brand_type_list)
     return device_code, phone_brand_type
 
-# 读取已保存的设备配置文件 hlxconfig.json
+# ------------------------------
+# 运行统计
+# ------------------------------
+# 按接口统计请求数、状态码、延迟和流量，以及各类主动等待的耗时，运行结束后写出报告
+default_metrics = Metrics()
+
+def endpoint_name(url):
+    # /user/signin/check/IOS/1.0 -> user/signin/check
+    return urlsplit(url).path.split('/IOS/')[0].strip('/')
+
+# 签到响应中表示今日已签到、以及确定失败（重试检测也无意义）的提示关键字
+already_signed_keywords = ("已签到", "已经签到", "重复签到")
+failed_keywords = ("不存在", "未登录", "登录失效", "无权限")
+# 其中表示版块本身失效的关键字；登录失效、风控限流等与版块无关，不计入失效版块
+board_error_keywords = ("不存在",)
+
+def classify_signin(result):
+    """
+    根据签到接口的响应判断结果
+    :return: 'signed' 签到成功，'already' 今日已签到，'failed' 确定失败，'unknown' 无法判断
+    """
+    if result.get('status') == 1:
+        return 'signed'
+    msg = str(result.get('msg') or '')
+    if any(k in msg for k in already_signed_keywords):
+        return 'already'
+    if any(k in msg for k in failed_keywords):
+        return 'failed'
+    return 'unknown'
+
+def report_board_failure(cat_id, result):
+    # 只统计服务器明确表示版块失效的响应，网络异常、登录失效和风控限流都不代表版块失效
+    msg = str(result.get('msg') or '')
+    if any(k in msg for k in board_error_keywords):
+        board_catalog.report(cat_id, ok=False)
+
+# 请求超时（连接超时, 读取超时），单位秒
+request_timeout = (5, float(os.getenv('REQUEST_TIMEOUT', '15')))
+
+# 默认共享的 HTTP 传输层，签到流程也可以自行创建并传入
+default_transport = Transport(timeout=request_timeout)
+
+user_info_url = f'{base_url}/user/info/IOS/1.0'
+
+# 签到断点记录：同一天重新运行时跳过已完成的账号和版块
+run_journal = RunJournal(os.getenv('JOURNAL_DIR', 'journal'))
+
+# 网络请求的重试策略（带抖动的指数退避）
+default_retry_policy = RetryPolicy(attempts=int(os.getenv('RETRY_ATTEMPTS', '3')))
+
+# 所有 HTTP 请求共享的节奏控制器，根据延迟和失败情况自动调整请求频率
+default_pacer = AdaptivePacer.from_env()
+
+# 设备配置和令牌统一保存在 SQLite 状态库中（state.db），首次运行时自动导入旧版 JSON 文件
 hlxconfig_path = "hlxconfig.json"
-if os.path.exists(hlxconfig_path):
-    with open(hlxconfig_path, "r") as f:
-        hlx_config = json.load(f)
-else:
-    hlx_config = {}
-
-# 将配置写回文件
+session_file = "session.json"
+state_store = open_store()
+state_store.import_json("devices", hlxconfig_path)
+state_store.import_json("sessions", session_file)
+
+# 版块目录：从 cat_id.json 或服务器分类接口加载并缓存，连续失败的版块在有效期内对所有账号跳过
+category_url = f'{base_url}/category/list/IOS/1.0'
+board_catalog = BoardCatalog(
+    state_store,
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "cat_id.json"),
+    ttl=float(os.getenv('BOARD_CACHE_TTL', '86400')),
+    source=os.getenv('BOARD_SOURCE', 'file'),
+    fetch=lambda: fetch_server_boards(
+        default_transport.session, category_url,
+        {'app_version': app_version, 'market_id': market_id, 'platform': platform}, headers),
+)
+
+# 按账号读写设备配置，用法与原来的字典相同
+hlx_config = TableView(state_store, "devices")
+
+# 提交缓存的设备配置写入
 def save_hlx_config():
-    with open(hlxconfig_path, "w") as f:
-        json.dump(hlx_config, f, indent=4)
-    logger.info("hlxconfig.json 已更新")
+    state_store.flush()
 
 # ------------------------------
 # 会话缓存操作（保存令牌信息到本地）
 # ------------------------------
-session_file = "session.json"
+# 令牌的有效期由 TokenManager 根据验证结果学习，不再固定假设 60 分钟
+token_manager = TokenManager(state_store, validate_after=float(os.getenv('TOKEN_VALIDATE_AFTER', '3600')))
+
+# 账号等级和经验进度，只在本地记录过期或可能升级时才请求用户信息
+progress_store = ProgressStore(state_store, refresh_after=float(os.getenv('PROGRESS_REFRESH', str(7 * 86400))))
+
+# 签到计划：按每秒经验值排序版块，设置 RUN_DEADLINE 时临近截止时间推迟低价值版块
+run_planner = RunPlanner(state_store, budget=float(os.getenv('RUN_DEADLINE', '0')) or None)
 
 def load_session(account):
-    if os.path.exists(session_file):
-        with open(session_file, "r") as f:
-            sessions = json.load(f)
-        if account in sessions:
-            sess = sessions[account]
-            try:
-                expire_time = datetime.fromisoformat(sess.get("expire_time"))
-            except Exception as e:
-                logger.error(f"解析过期时间失败: {e}")
-                return None
-            tz = timezone('Asia/Shanghai')
-            if datetime.now(tz) < expire_time:
-                return sess
-    return None
-
-def save_session(account, _key, user_id, valid_minutes=60):
-    tz = timezone('Asia/Shanghai')
-    expire_time = datetime.now(tz) + timedelta(minutes=valid_minutes)
-    sess = {"_key": _key, "user_id": user_id, "expire_time": expire_time.isoformat()}
-    sessions = {}
-    if os.path.exists(session_file):
-        with open(session_file, "r") as f:
-            sessions = json.load(f)
-    sessions[account] = sess
-    with open(session_file, "w") as f:
-        json.dump(sessions, f, indent=4)
+    return token_manager.load(account)
+
+def save_session(account, _key, user_id):
+    token_manager.save(account, _key, user_id)
 
 # ------------------------------
 # 葫芦侠签到类
 # ------------------------------
 class HuluxiaSignin:
-    def __init__(self):
-        self._key = ''
-        self.userid = ''
-        self.device_code = ''
-        self.phone_brand_type = ''
-        self.session = requests.Session()
+    def __init__(self, transport=None, pacer=None, skip_check=None, metrics=None):
+        # 账号身份信息放在独立的上下文中，每次签到新建，避免账号之间串用令牌和设备
+        self.ctx = AccountContext()
+        # 所有账号共用同一个传输层，复用连接池
+        self.transport = transport or default_transport
+        self.pacer = pacer or default_pacer
+        self.retry_policy = default_retry_policy
+        self.metrics = metrics or default_metrics
+        # 跳过检测模式：直接签到，每个版块少发一次检测请求
+        self.skip_check = os.getenv('SKIP_CHECK') == '1' if skip_check is None else skip_check
+        # 最近一次 signin() 实际发出的请求数（含失败后的检测和重发），用于统计跳过检测模式节省的请求
+        self.signin_requests = 0
 
     def md5(self, text):
         _md5 = hashlib.md5()
         _md5.update(text.encode())
         return _md5.hexdigest()
 
+    def _request(self, method, url, is_ok=None, idempotent=True, relogin=True, **kwargs):
+        # 所有请求统一经过节奏控制器：发送前等待，完成后反馈延迟和结果
+        # is_ok 用于自定义哪些响应算作正常，默认要求 status == 1
+        # 幂等请求在网络异常、限流或服务器错误时退避重试；非幂等请求只在确定未发出时重发
+        # relogin 为 True 时，令牌失效会自动重新登录并用新令牌重发一次；每个账号每次签到最多重新登录一次
+        endpoint = endpoint_name(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            # 熔断时在这里等待恢复，不计入请求耗时；等待超时抛出 CircuitOpenError，此时请求并未发出
+            self.metrics.sleep('circuit', self.transport.acquire(url))
+            self.metrics.sleep('pacer', self.pacer.wait(self.ctx.account, run_planner.delay_scale()))
+            start = time.monotonic()
+            res = None
+            try:
+                res = self.transport.request(method, url, headers=headers, **kwargs)
+                if retryable_status(res.status_code):
+                    raise requests.exceptions.HTTPError(f"HTTP {res.status_code}", response=res)
+                data = res.json()
+            except requests.exceptions.RequestException as e:
+                latency = time.monotonic() - start
+                self.pacer.record(self.ctx.account, latency, ok=False)
+                self.observe(endpoint, res, None, latency, e)
+                rejected = isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 429
+                can_retry = idempotent or safe_to_resend(e) or rejected
+                if not can_retry or attempt >= self.retry_policy.attempts:
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                logger.warning(f"请求失败（{e}），{delay:.1f} 秒后第 {attempt} 次重试")
+                self.metrics.sleep('retry', delay)
+                time.sleep(delay)
+                continue
+            latency = time.monotonic() - start
+            ok = res.status_code == 200 and (is_ok(data) if is_ok else data.get('status', 1) == 1)
+            self.pacer.record(self.ctx.account, latency, ok=ok)
+            self.observe(endpoint, res, data.get('status'), latency)
+            if relogin and self.ctx.password and not self.ctx.relogin_tried and is_auth_error(data):
+                logger.info(f"账号 {self.ctx.account} 令牌失效，重新登录")
+                relogin = False
+                self.ctx.relogin_tried = True
+                if self.ctx.token:
+                    # 复用的令牌实际已失效，这次并没有省去登录
+                    token_manager.reuse_failed(self.ctx.account, self.ctx.token)
+                    self.ctx.token = None
+                else:
+                    token_manager.invalidate(self.ctx.account)
+                if self.login():
+                    # 用新令牌替换请求参数中的旧令牌后重发
+                    for field in ('data', 'params'):
+                        if isinstance(kwargs.get(field), dict) and '_key' in kwargs[field]:
+                            kwargs[field] = dict(kwargs[field], _key=self.ctx._key, user_id=self.ctx.userid)
+                    continue
+            return data
+
+    def observe(self, endpoint, res, api_status, latency, error=None):
+        # 网络异常时没有响应，状态码记为异常类名
+        if res is None:
+            self.metrics.observe(endpoint, type(error).__name__, api_status, latency)
+            return
+        body = res.request.body or b''
+        bytes_out = len(res.request.url) + len(body if isinstance(body, bytes) else body.encode())
+        self.metrics.observe(endpoint, res.status_code, api_status, latency, bytes_out, len(res.content))
+
     # 修改后的登录函数，使用新请求参数格式，避免重复登录
     def psd_login(self, account, password):
-        login_url = 'https://floor.huluxia.com/account/login/IOS/1.0'
+        login_url = f'{base_url}/account/login/IOS/1.0'
         login_data = {
             'access_token': '',
             'app_version': app_version,
             'code': '',
-            'device_code': self.device_code,
+            'device_code': self.ctx.device_code,
             'device_model': 'iPhone14,3',
             'email': account,
             'market_id': market_id,
@@ -201,142 +245,449 @@ class HuluxiaSignin:
             'phone': '',
             'platform': platform
         }
+        self.ctx.account = account
         try:
-            res = self.session.post(url=login_url, data=login_data, headers=headers)
-            return res.json()
+            return self._request('POST', login_url, data=login_data, relogin=False)
         except requests.exceptions.RequestException as e:
             logger.error(f"登录请求失败：{e}")
             return {"status": 0}
 
     def set_config(self, acc, psd):
+        self.ctx = AccountContext(account=acc)
         # 根据账号判断是否已有保存的设备配置
         if acc in hlx_config:
-            self.device_code = hlx_config[acc].get("device_code")
-            self.phone_brand_type = hlx_config[acc].get("phone_brand_type")
-            logger.info(f"使用已保存的设备配置: {self.device_code}, {self.phone_brand_type}")
+            self.ctx.device_code = hlx_config[acc].get("device_code")
+            self.ctx.phone_brand_type = hlx_config[acc].get("phone_brand_type")
+            logger.info(f"使用已保存的设备配置: {self.ctx.device_code}, {self.ctx.phone_brand_type}")
         else:
-            self.device_code, self.phone_brand_type = generate_random_device_config()
-            logger.info(f"生成新的设备配置: {self.device_code}, {self.phone_brand_type}")
+            self.ctx.device_code, self.ctx.phone_brand_type = generate_random_device_config()
+            logger.info(f"生成新的设备配置: {self.ctx.device_code}, {self.ctx.phone_brand_type}")
 
-        # 尝试加载本地缓存的令牌信息，防止重复登录
+        self.ctx.password = psd
+
+        # 尝试加载本地缓存的令牌信息，必要时先用 user_info 验证，防止重复登录
         session_data = load_session(acc)
-        if session_data:
+        if session_data and self.validate_token(session_data):
             logger.info("使用本地缓存的令牌信息")
-            self._key = session_data['_key']
-            self.userid = session_data['user_id']
+            token_manager.reuse()
+            self.ctx.token = session_data
             return True
 
         # 无有效缓存则重新登录
-        data = self.psd_login(acc, psd)
-        if data.get('status') == 0:
+        return self.login()
+
+    def validate_token(self, token):
+        """
+        使用缓存的令牌，距上次验证较久时通过 user_info 确认令牌仍然有效
+        :return: 令牌是否可用
+        """
+        self.ctx._key = token['_key']
+        self.ctx.userid = token['user_id']
+        if not token_manager.needs_validation(token):
+            return True
+        try:
+            data = self._request('GET', user_info_url, params=self.user_info_params(), relogin=False)
+        except requests.exceptions.RequestException as e:
+            # 网络异常无法判断令牌是否有效，交给后续请求的失败重登处理
+            logger.warning(f"验证令牌失败：{e}")
+            return True
+        valid = not is_auth_error(data)
+        token_manager.observe(self.ctx.account, token, valid)
+        if valid:
+            # 验证时已经拿到用户信息，签到时不再重复请求
+            self.ctx.profile = data
+        else:
+            logger.info("本地缓存的令牌已失效，重新登录")
+        return valid
+
+    def login(self):
+        """
+        使用上下文中的账号密码登录并保存令牌
+        :return: 是否登录成功
+        """
+        acc = self.ctx.account
+        data = self.psd_login(acc, self.ctx.password)
+        if data.get('status') != 1 or '_key' not in data:
             logger.error(f"账号 {acc} 登录失败，请检查账号或密码")
             return False
 
-        # 更新设备配置文件
+        # 更新设备配置（与令牌一起批量提交到状态库）
         hlx_config[acc] = {
-            "device_code": self.device_code,
-            "phone_brand_type": self.phone_brand_type
+            "device_code": self.ctx.device_code,
+            "phone_brand_type": self.ctx.phone_brand_type
         }
-        save_hlx_config()
 
-        self._key = data['_key']
-        self.userid = data['user']['userID']
+        self.ctx._key = data['_key']
+        self.ctx.userid = data['user']['userID']
 
-        # 保存令牌到本地，有效期可根据实际情况调整
-        save_session(acc, self._key, self.userid, valid_minutes=60)
+        # 保存令牌到本地，有效期由 TokenManager 学习
+        save_session(acc, self.ctx._key, self.ctx.userid)
         return True
 
+    def user_info_params(self):
+        return {
+            'app_version': app_version,
+            'market_id': market_id,
+            'platform': platform,
+            '_key': self.ctx._key,
+            'device_code': self.ctx.device_code,
+            'user_id': self.ctx.userid
+        }
+
     def user_info(self):
-        info_url = f'https://floor.huluxia.com/user/info/IOS/1.0?app_version={app_version}&market_id={market_id}&platform={platform}&_key={self._key}&device_code={self.device_code}&user_id={self.userid}'
         try:
-            res = self.session.get(url=info_url, headers=headers)
-            data = res.json()
+            # 验证令牌时已获取过的用户信息直接复用
+            data = self.ctx.profile or self._request('GET', user_info_url, params=self.user_info_params())
             return data.get('nick'), data.get('level'), data.get('exp'), data.get('nextExp')
         except Exception as e:
             logger.error(f"获取用户信息失败：{e}")
             return None, None, None, None
 
+    def progress(self):
+        """
+        读取账号的等级和经验：令牌验证时已拿到用户信息则直接使用；
+        否则本地记录未过期且不会升级时按记录推算，不发送请求
+        :return: (昵称, 等级, 经验值, 升级所需经验值)
+        """
+        acc = self.ctx.account
+        if self.ctx.profile is None and not progress_store.needs_refresh(acc):
+            progress_store.skip()
+            row = progress_store.get(acc)
+            return row['nick'], row['level'], row['exp'], row['next_exp']
+        nick, level, exp, next_exp = self.user_info()
+        if nick:
+            progress_store.refresh(acc, nick, level, exp, next_exp)
+        return nick, level, exp, next_exp
+
     def check_signin(self, cat_id):
-        check_url = 'https://floor.huluxia.com/user/signin/check/IOS/1.0'
+        check_url = f'{base_url}/user/signin/check/IOS/1.0'
         data = {
-            '_key': self._key,
+            '_key': self.ctx._key,
             'app_version': app_version,
             'cat_id': cat_id,
-            'device_code': self.device_code,
+            'device_code': self.ctx.device_code,
             'market_id': market_id,
             'platform': platform,
-            'user_id': self.userid
+            'user_id': self.ctx.userid
         }
         try:
-            res = self.session.post(url=check_url, data=data, headers=headers)
-            return res.json()
+            return self._request('POST', check_url, data=data)
         except requests.exceptions.RequestException as e:
             logger.error(f"签到检测失败：{e}")
             return {"status": 0}
 
     def signin(self, cat_id):
-        signin_url = 'https://floor.huluxia.com/user/signin/IOS/1.1'
+        signin_url = f'{base_url}/user/signin/IOS/1.1'
         data = {
-            '_key': self._key,
+            '_key': self.ctx._key,
             'app_version': app_version,
             'cat_id': cat_id,
-            'device_code': self.device_code,
+            'device_code': self.ctx.device_code,
             'market_id': market_id,
             'platform': platform,
-            'user_id': self.userid
+            'user_id': self.ctx.userid
         }
+        self.signin_requests = 1
         try:
-            res = self.session.post(url=signin_url, data=data, headers=headers)
-            return res.json()
+            # 签到不是幂等请求，只在确定未发出时重发；跳过检测模式下“今日已签到”是正常结果，不应触发降速
+            return self._request('POST', signin_url, data=data, idempotent=False,
+                                 is_ok=lambda d: classify_signin(d) in ('signed', 'already'))
         except requests.exceptions.RequestException as e:
             logger.error(f"签到失败：{e}")
-            return {"status": 0}
+            if isinstance(e, CircuitOpenError):
+                self.signin_requests = 0
+                return {"status": 0}
+            # 请求可能已经被服务器处理，用检测接口确认，避免重复签到
+            self.signin_requests += 1
+            check_result = self.check_signin(cat_id)
+            if check_result.get('status') != 1:
+                return {"status": 0}
+            if check_result.get('signin') != 0:
+                return {"status": 0, "msg": "已签到（请求失败后经检测确认）"}
+            # 确认未签到，可以安全地重发一次
+            self.signin_requests += 1
+            try:
+                return self._request('POST', signin_url, data=data, idempotent=False,
+                                     is_ok=lambda d: classify_signin(d) in ('signed', 'already'))
+            except requests.exceptions.RequestException as e:
+                logger.error(f"签到重试失败：{e}")
+                return {"status": 0}
 
     def huluxia_signin(self, acc, psd):
+        set_log_context(account=acc)
+        # 同一天内已完成的账号直接跳过，不发送任何请求
+        if run_journal.account_done(acc):
+            logger.info(f"账号 {acc} 今日已完成签到，跳过")
+            return f"账号 {acc} 今日已完成签到\n"
+        # 剩余时间不够登录后签完一个版块时直接推迟，不再登录
+        boards = board_catalog.active_boards()
+        if run_planner.should_skip_account([b for b in boards if not run_journal.board_done(acc, b)]):
+            self.metrics.incr('accounts_deferred')
+            return f"账号 {acc} 已到截止时间，推迟到下次签到\n"
+
+        setup_start = time.monotonic()
         if not self.set_config(acc, psd):
+            self.pacer.forget(acc)
             return f"账号 {acc} 登录失败，请检查账号或密码\n"
 
-        nick, level, exp, next_exp = self.user_info()
+        nick, level, exp, next_exp = self.progress()
         if not nick:
+            self.pacer.forget(acc)
             return f"用户信息获取失败，跳过账号 {acc}\n"
+        run_planner.observe_setup(time.monotonic() - setup_start)
         
         logger.info(f"正在为用户 {nick} 签到，等级: Lv.{level}, 当前经验值: {exp}/{next_exp}")
         summary = f"用户 <{nick}> 签到中...\n等级: Lv.{level}\n当前经验值: {exp}/{next_exp}\n"
         exp_get = 0
+        all_done = True
+
+        # 版块之间的请求间隔由节奏控制器决定：服务器响应快时缩短，出现失败或风控时自动退避
+        # 版块按每秒经验值从高到低签到，临近截止时间时推迟低价值版块
+        deferred = 0
+        for cat_id, cat_name in run_planner.order(boards):
+            if run_journal.board_done(acc, cat_id):
+                continue
+            if run_planner.should_defer(cat_id, boards):
+                deferred += 1
+                all_done = False
+                continue
+            set_log_context(account=acc, board=cat_id)
+            start = time.monotonic()
+            if self.skip_check:
+                outcome, exp_val = self.direct_signin_board(cat_id, cat_name)
+            else:
+                outcome, exp_val = self.signin_board(cat_id, cat_name)
+            run_planner.observe(cat_id, outcome, exp_val, time.monotonic() - start)
+            exp_get += exp_val
+            if outcome in ('signed', 'already'):
+                run_journal.record(acc, cat_id, outcome, exp_val)
+            else:
+                all_done = False
+
+        set_log_context(account=acc)
+        if all_done:
+            run_journal.record(acc, ACCOUNT_DONE, 'done')
+        self.pacer.forget(acc)
+        progress_store.record(acc, exp_get)
+        self.metrics.incr('exp_gained', exp_get)
+        summary += f"本次签到共获得经验值: {exp_get}\n"
+        if deferred:
+            self.metrics.incr('boards_deferred', deferred)
+            logger.warning(f"账号 {acc} 临近截止时间，{deferred} 个版块推迟到下次运行")
+            summary += f"临近截止时间，{deferred} 个版块推迟到下次签到\n"
+        days = progress_store.days_to_next_level(acc)
+        if days is not None:
+            summary += f"预计 {days} 天后升级\n"
+        return summary
 
-        # 对每个版块签到均加入随机延时，降低请求频率，防止风控检测
-        for cat_id, cat_name in cat_id_dict.items():
-            check_result = self.check_signin(cat_id)
-            if check_result.get('status') == 1:
-                if check_result.get('signin') == 0:
-                    logger.info(f"版块 {cat_name} 未签到，正在签到...")
-                    signin_result = self.signin(cat_id)
-                    if signin_result.get('status') == 1:
-                        exp_val = signin_result.get('experienceVal', 0)
-                        exp_get += exp_val
-                        logger.info(f"版块 {cat_name} 签到成功，获得经验值: {exp_val}")
-                    else:
-                        logger.error(f"版块 {cat_name} 签到失败")
-                else:
+    def signin_board(self, cat_id, cat_name):
+        """
+        先检测再签到
+        :return: (结果, 获得的经验值)，结果为 signed、already 或 failed
+        """
+        check_result = self.check_signin(cat_id)
+        if check_result.get('status') == 1:
+            if check_result.get('signin') == 0:
+                logger.info(f"版块 {cat_name} 未签到，正在签到...")
+                signin_result = self.signin(cat_id)
+                if signin_result.get('status') == 1:
+                    board_catalog.report(cat_id, ok=True)
+                    exp_val = signin_result.get('experienceVal', 0)
+                    logger.info(f"版块 {cat_name} 签到成功，获得经验值: {exp_val}")
+                    return 'signed', exp_val
+                if classify_signin(signin_result) == 'already':
                     logger.info(f"版块 {cat_name} 今日已签到")
+                    return 'already', 0
+                report_board_failure(cat_id, signin_result)
+                logger.error(f"版块 {cat_name} 签到失败")
             else:
-                logger.error(f"版块 {cat_name} 签到检测失败")
-            # 每个版块之间随机等待1~3秒
-            time.sleep(random.uniform(1, 3))
+                board_catalog.report(cat_id, ok=True)
+                logger.info(f"版块 {cat_name} 今日已签到")
+                return 'already', 0
+        else:
+            report_board_failure(cat_id, check_result)
+            logger.error(f"版块 {cat_name} 签到检测失败")
+        return 'failed', 0
+
+    def direct_signin_board(self, cat_id, cat_name):
+        """
+        跳过检测直接签到，根据签到响应判断结果；响应无法判断时退回先检测再签到
+        :return: (结果, 获得的经验值)，结果为 signed、already 或 failed
+        """
+        signin_result = self.signin(cat_id)
+        outcome = classify_signin(signin_result)
+        # 与先检测再签到相比节省的请求数：未签到的版块原本要发检测和签到两次请求，
+        # 已签到或失败的版块原本只发一次检测；签到失败后的检测和重发都计为负节省
+        if outcome == 'signed':
+            self.metrics.incr('requests_saved', 2 - self.signin_requests)
+        elif outcome in ('already', 'failed'):
+            self.metrics.incr('requests_saved', 1 - self.signin_requests)
+        if outcome in ('signed', 'already'):
+            board_catalog.report(cat_id, ok=True)
+        if outcome == 'signed':
+            exp_val = signin_result.get('experienceVal', 0)
+            logger.info(f"版块 {cat_name} 签到成功，获得经验值: {exp_val}")
+            return outcome, exp_val
+        if outcome == 'already':
+            logger.info(f"版块 {cat_name} 今日已签到")
+            return outcome, 0
+        if outcome == 'failed':
+            report_board_failure(cat_id, signin_result)
+            logger.error(f"版块 {cat_name} 签到失败：{signin_result.get('msg')}")
+            return outcome, 0
+        # 无法判断时之后的先检测再签到与原流程相同，本次签到发出的请求全部计为负节省
+        self.metrics.incr('requests_saved', -self.signin_requests)
+        logger.warning(f"版块 {cat_name} 签到响应无法判断，改为先检测再签到")
+        return self.signin_board(cat_id, cat_name)
+
+# ------------------------------
+# 异步签到类
+# ------------------------------
+class AsyncHuluxiaSignin:
+    """
+    HuluxiaSignin 的异步版本，每个实例对应一个账号。
+    网络请求仍由 requests 完成，放到线程池中执行，不阻塞事件循环；
+    单个账号内部的版块顺序与随机延时保持不变。
+    """
+    def __init__(self, transport=None, pacer=None, metrics=None, profiler=None):
+        """
+        :param profiler: 性能分析器（profiling.Profiler），指定时记录 huluxia_signin 的性能数据
+        """
+        self.profiler = profiler
+        if profiler:
+            metrics, transport = profiler.wrap(metrics or default_metrics, transport or default_transport)
+        self.client = HuluxiaSignin(transport=transport, pacer=pacer, metrics=metrics)
+
+    async def psd_login(self, account, password):
+        return await asyncio.to_thread(self.client.psd_login, account, password)
+
+    async def set_config(self, acc, psd):
+        return await asyncio.to_thread(self.client.set_config, acc, psd)
+
+    async def user_info(self):
+        return await asyncio.to_thread(self.client.user_info)
+
+    async def check_signin(self, cat_id):
+        return await asyncio.to_thread(self.client.check_signin, cat_id)
+
+    async def signin(self, cat_id):
+        return await asyncio.to_thread(self.client.signin, cat_id)
+
+    async def huluxia_signin(self, acc, psd):
+        if self.profiler:
+            return await asyncio.to_thread(self.profiler.run, acc, self.client.metrics,
+                                           self.client.huluxia_signin, acc, psd)
+        return await asyncio.to_thread(self.client.huluxia_signin, acc, psd)
+
+
+async def signin_accounts(accounts, concurrency=4, start_interval=5.0, transport=None, pacer=None, metrics=None,
+                          on_result=None, collect=True, egress=None, profiler=None):
+    """
+    并发为多个账号签到。账号按需逐个取出，可以传入生成器，账号再多也不会一次性全部读入内存
+    :param accounts: 可迭代的 (账号, 密码)
+    :param concurrency: 同时签到的账号数上限
+    :param start_interval: 同一出口上相邻两个账号开始签到的最小间隔（秒），避免瞬间并发登录
+    :param transport: 共享的 HTTP 传输层，指定时所有账号都经过它发送，不使用出口池
+    :param pacer: 与 transport 一起使用的节奏控制器，默认使用 default_pacer
+    :param egress: 出口池，transport 和 egress 都未指定时按环境变量 EGRESS 新建一个，签到结束后关闭
+    :param metrics: 指标收集器，默认使用 default_metrics
+    :param on_result: 每个账号签到结束后立即调用 on_result(账号, 签到结果或异常)，如把结果放入通知队列、释放租约，在线程池中执行
+    :param collect: 是否保存并返回所有账号的结果；账号很多且已通过 on_result 处理结果时可关闭
+    :param profiler: 性能分析器（profiling.Profiler），指定时逐账号记录性能数据，由调用方关闭
+    :return: 按签到完成顺序的 [(账号, 签到结果或异常), ...]，collect 为 False 时为空列表
+    """
+    concurrency = max(1, int(concurrency))
+    metrics = metrics or default_metrics
+    own_egress = transport is None and egress is None
+    if transport is not None:
+        egress = EgressPool([Egress('direct', transport, pacer or default_pacer)])
+    elif egress is None:
+        egress = EgressPool.from_env(pool_maxsize=concurrency, timeout=request_timeout, health_url=base_url)
+    egress.start(float(os.getenv('EGRESS_CHECK_INTERVAL', '60')))
+    run_planner.start()
+    loop = asyncio.get_running_loop()
+    start_locks = {e.name: asyncio.Lock() for e in egress.egresses}
+    last_start = {}
+    pending = iter(accounts)
+    pending_lock = asyncio.Lock()
+    results = []
+    count = [0]
+
+    async def next_account():
+        # 读取账号文件、认领租约等可能阻塞，放到线程池中执行；生成器不能被多个线程同时迭代，取账号时加锁
+        async with pending_lock:
+            return await asyncio.to_thread(next, pending, None)
+
+    async def worker():
+        # 每个 worker 签完一个账号再取下一个，同时签到的账号数不超过 worker 数
+        while True:
+            item = await next_account()
+            if item is None:
+                break
+            acc, psd = item
+            route = egress.route(acc)
+            # 控制账号启动节奏，保证同一出口上相邻账号的登录请求至少间隔 start_interval 秒
+            async with start_locks[route.name]:
+                wait = last_start.get(route.name, 0.0) + start_interval * run_planner.delay_scale() - loop.time()
+                if wait > 0:
+                    metrics.sleep('account_start', wait)
+                    await asyncio.sleep(wait)
+                last_start[route.name] = loop.time()
+            try:
+                client = AsyncHuluxiaSignin(transport=route.transport, pacer=route.pacer, metrics=metrics,
+                                            profiler=profiler)
+                result = await client.huluxia_signin(acc, psd)
+            except Exception as e:
+                result = e
+            count[0] += 1
+            if on_result:
+                await asyncio.to_thread(on_result, acc, result)
+            if collect:
+                results.append((acc, result))
+
+    # 默认线程池大小可能小于并发数，这里按并发数单独设置
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    run_planner.save()
+    save_hlx_config()
+    stats = egress.stats()
+    logger.info(f"共发送请求 {stats['requests']} 次，新建连接 {stats['connections']} 个，复用连接 {stats['reused']} 次")
+    if len(stats['egress']) > 1:
+        logger.info("各出口请求数：" + "，".join(f"{name} {n}" for name, n in stats['egress'].items()))
+    if own_egress:
+        egress.close()
+    metrics.incr('accounts', count[0])
+    metrics.incr('connections', stats['connections'])
+    metrics.incr('connections_reused', stats['reused'])
+    stats = token_manager.stats
+    logger.info(f"登录 {stats['logins']} 次，复用令牌避免登录 {stats['logins_avoided']} 次，验证令牌 {stats['validations']} 次")
+    for name, n in stats.items():
+        metrics.incr(f'token_{name}', n)
+    stats = progress_store.stats
+    logger.info(f"查询用户信息 {stats['refreshes']} 次，按本地记录跳过 {stats['skipped']} 次")
+    for name, n in stats.items():
+        metrics.incr(f'user_info_{name}', n)
+    requests_saved = metrics.counters['requests_saved']
+    if requests_saved:
+        logger.info(f"跳过检测模式本次共节省请求 {requests_saved} 次")
+    return results
 
-        summary += f"本次签到共获得经验值: {exp_get}\n"
-        return summary
 
 # ------------------------------
 # 主函数
 # ------------------------------
 if __name__ == "__main__":
-    summary_all = ""
+    from accounts import AccountSource
+    from notifier import get_notifier
+
+    email_config = json.loads(os.getenv("EMAIL_CONFIG") or "{}")
+    notifier = get_notifier(os.getenv("NOTIFIER_TYPE") or ("email" if email_config else "none"), email_config)
     # 对于多账号，每个账号之间也加上随机等待时间，降低服务器风控风险
-    for acc, psd in accounts:
+    for acc, psd in AccountSource.from_env():
         signin = HuluxiaSignin()
         summary = signin.huluxia_signin(acc, psd)
-        summary_all += summary + "\n"
+        # 放入通知队列后立即继续，不等待发送完成
+        notifier.send(summary)
         # 每个账号之间随机等待5~10秒
         time.sleep(random.uniform(5, 10))
-    email_push("葫芦侠签到报告", summary_all)
+    notifier.close()
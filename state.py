@@ -0,0 +1,176 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+
+# 各状态表的列定义，主键均为账号
+TABLES = {
+    "devices": ("device_code", "phone_brand_type"),
+    "sessions": ("_key", "user_id", "expire_time"),
+}
+
+
+class StateStore:
+    """
+    基于 SQLite（WAL 模式）的本地状态存储，替代 hlxconfig.json 和 session.json。
+    按账号建立主键索引，写入先缓存再批量提交，每批在一个事务内原子完成；
+    WAL 模式加忙等待超时，支持多个签到进程同时读写同一个数据库文件。
+    """
+    def __init__(self, path: str = "state.db", batch_size: int = 20):
+        """
+        :param path: 数据库文件路径
+        :param batch_size: 缓存多少条写入后自动提交
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.pending = {}
+        for table, columns in TABLES.items():
+            self.ensure_table(table, columns)
+
+    def ensure_table(self, table: str, columns: tuple):
+        """
+        注册并创建状态表（已存在时忽略），供其他模块保存自己的状态
+        :param table: 表名
+        :param columns: 除主键 account 外的列名
+        """
+        TABLES[table] = tuple(columns)
+        cols = ", ".join(f'"{c}"' for c in columns)
+        with self._conn() as conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (account TEXT PRIMARY KEY, {cols}, updated_at REAL)')
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程共享，每个线程各自持有一个
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, table: str, account: str):
+        """
+        读取账号在某张表中的记录
+        :return: 列名到值的字典，不存在时返回 None
+        """
+        with self.lock:
+            row = self.pending.get((table, account))
+        if row is not None:
+            return dict(row)
+        columns = TABLES[table]
+        cols = ", ".join(f'"{c}"' for c in columns)
+        res = self._conn().execute(f"SELECT {cols} FROM {table} WHERE account = ?", (account,)).fetchone()
+        return dict(zip(columns, res)) if res else None
+
+    def put(self, table: str, account: str, row: dict):
+        """
+        写入账号记录，达到 batch_size 条后自动提交
+        """
+        with self.lock:
+            self.pending[(table, account)] = {c: row.get(c) for c in TABLES[table]}
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def delete(self, table: str, account: str):
+        self.flush()
+        with self._conn() as conn:
+            conn.execute(f"DELETE FROM {table} WHERE account = ?", (account,))
+
+    def accounts(self, table: str) -> list:
+        self.flush()
+        return [r[0] for r in self._conn().execute(f"SELECT account FROM {table}")]
+
+    def flush(self):
+        """
+        在一个事务内提交所有缓存的写入
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        conn = self._conn()
+        now = time.time()
+        began = False
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            began = True
+            for (table, account), row in pending.items():
+                columns = TABLES[table]
+                cols = ", ".join(f'"{c}"' for c in columns)
+                marks = ", ".join("?" for _ in columns)
+                conn.execute(f"INSERT OR REPLACE INTO {table} (account, {cols}, updated_at) VALUES (?, {marks}, ?)",
+                             (account, *(row[c] for c in columns), now))
+            conn.execute("COMMIT")
+        except Exception:
+            # 其他进程持有写锁时 BEGIN 本身也会失败，此时没有需要回滚的事务
+            if began:
+                conn.execute("ROLLBACK")
+            with self.lock:
+                # 提交失败时放回缓存，期间新写入的记录优先
+                pending.update(self.pending)
+                self.pending = pending
+            raise
+
+    def import_json(self, table: str, path: str):
+        """
+        表为空时从旧版 JSON 文件导入数据，用于从 hlxconfig.json / session.json 迁移
+        """
+        if not os.path.exists(path):
+            return
+        if self._conn().execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+            return
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        for account, row in data.items():
+            self.put(table, account, row)
+        self.flush()
+
+
+class TableView(MutableMapping):
+    """
+    把状态表包装成字典，兼容原来直接读写 hlx_config 的代码
+    """
+    def __init__(self, store: StateStore, table: str):
+        self.store = store
+        self.table = table
+
+    def __getitem__(self, account):
+        row = self.store.get(self.table, account)
+        if row is None:
+            raise KeyError(account)
+        return row
+
+    def __setitem__(self, account, row):
+        self.store.put(self.table, account, row)
+
+    def __delitem__(self, account):
+        if account not in self:
+            raise KeyError(account)
+        self.store.delete(self.table, account)
+
+    def __contains__(self, account):
+        return self.store.get(self.table, account) is not None
+
+    def __iter__(self):
+        return iter(self.store.accounts(self.table))
+
+    def __len__(self):
+        return len(self.store.accounts(self.table))
+
+
+def open_store(path: str = None) -> StateStore:
+    """
+    打开状态库（路径取自环境变量 STATE_DB，默认 state.db），进程退出时自动提交剩余写入
+    """
+    store = StateStore(path or os.getenv("STATE_DB", "state.db"))
+    atexit.register(store.flush)
+    return store
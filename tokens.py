@@ -0,0 +1,133 @@
+import threading
+import time
+
+# 服务器返回“未登录”类错误时的错误码
+AUTH_ERROR_CODES = (103,)
+
+
+def is_auth_error(data: dict) -> bool:
+    """
+    判断响应是否表示令牌失效
+    """
+    if data.get('status') == 1:
+        return False
+    return data.get('code') in AUTH_ERROR_CODES or '未登录' in str(data.get('msg') or '')
+
+
+class TokenManager:
+    """
+    令牌生命周期管理：记录每个令牌的登录时间，通过验证结果学习令牌的实际有效期。
+    - 使用前按需用低成本请求（user_info）验证缓存的令牌
+    - 接近学习到的有效期时提前重新登录
+    - 请求返回未登录错误时由调用方透明地重新登录
+    线程安全。
+    """
+    def __init__(self, store, validate_after: float = 3600, refresh_margin: float = 0.9):
+        """
+        :param store: StateStore 实例
+        :param validate_after: 距上次验证超过多少秒后，使用前需要重新验证
+        :param refresh_margin: 令牌年龄超过有效期估计值的该比例时提前重新登录
+        """
+        self.store = store
+        self.validate_after = validate_after
+        self.refresh_margin = refresh_margin
+        self.lock = threading.Lock()
+        self.stats = {"logins": 0, "logins_avoided": 0, "validations": 0, "expired": 0}
+        store.ensure_table("tokens", ("_key", "user_id", "login_at", "validated_at"))
+        # 全局一行（account='*'）：valid_max 为验证通过的最大令牌年龄，invalid_min 为验证失败的最小令牌年龄
+        store.ensure_table("token_lifetime", ("valid_max", "invalid_min"))
+
+    def _count(self, name: str):
+        with self.lock:
+            self.stats[name] += 1
+
+    def lifetime(self):
+        """
+        :return: 需要提前重新登录的令牌年龄（秒），尚未观察到失效时返回 None
+        """
+        row = self.store.get("token_lifetime", "*")
+        if not row or not row["invalid_min"]:
+            return None
+        # 有效期落在 [valid_max, invalid_min] 之间，保守取下界附近
+        return max(row["valid_max"] or 0, row["invalid_min"] * self.refresh_margin)
+
+    def _legacy(self, account: str):
+        # 兼容旧版 sessions 表中的令牌，登录时间未知，使用前必须验证
+        sess = self.store.get("sessions", account)
+        if not sess or not sess.get("_key"):
+            return None
+        return {"_key": sess["_key"], "user_id": sess["user_id"], "login_at": None, "validated_at": None}
+
+    def load(self, account: str):
+        """
+        读取账号的缓存令牌，接近有效期时返回 None 以便提前重新登录
+        :return: {"_key", "user_id", "login_at", "validated_at"} 或 None
+        """
+        token = self.store.get("tokens", account)
+        if not token or not token["_key"]:
+            token = self._legacy(account)
+        if not token:
+            return None
+        lifetime = self.lifetime()
+        if lifetime and token["login_at"] and time.time() - token["login_at"] > lifetime:
+            self._count("expired")
+            return None
+        return token
+
+    def needs_validation(self, token: dict) -> bool:
+        validated_at = token.get("validated_at")
+        return not validated_at or time.time() - validated_at > self.validate_after
+
+    def observe(self, account: str, token: dict, valid: bool):
+        """
+        记录一次令牌验证结果，并据此更新有效期估计
+        """
+        self._count("validations")
+        now = time.time()
+        self._learn(token, valid, now)
+        if valid:
+            self.store.put("tokens", account, dict(token, validated_at=now))
+        else:
+            self.invalidate(account)
+
+    def _learn(self, token: dict, valid: bool, now: float):
+        if token.get("login_at"):
+            age = now - token["login_at"]
+            with self.lock:
+                row = self.store.get("token_lifetime", "*") or {"valid_max": 0, "invalid_min": None}
+                if valid:
+                    row["valid_max"] = max(row["valid_max"] or 0, age)
+                    if row["invalid_min"] and age >= row["invalid_min"]:
+                        # 有效期比之前观察到的更长，丢弃旧的上界重新学习
+                        row["invalid_min"] = None
+                elif not row["invalid_min"] or age < row["invalid_min"]:
+                    row["invalid_min"] = max(age, row["valid_max"] or 0)
+                self.store.put("token_lifetime", "*", row)
+
+    def reuse(self):
+        """
+        记录一次成功复用令牌（省去一次登录）
+        """
+        self._count("logins_avoided")
+
+    def reuse_failed(self, account: str, token: dict):
+        """
+        复用的令牌在签到请求中返回未登录错误：撤销省去登录的计数，并把这次失效计入有效期估计
+        """
+        with self.lock:
+            self.stats["logins_avoided"] -= 1
+        self._learn(token, False, time.time())
+        self.invalidate(account)
+
+    def save(self, account: str, _key: str, user_id):
+        """
+        保存新登录得到的令牌
+        """
+        self._count("logins")
+        now = time.time()
+        self.store.put("tokens", account, {"_key": _key, "user_id": user_id, "login_at": now, "validated_at": now})
+
+    def invalidate(self, account: str):
+        self.store.put("tokens", account, {"_key": None, "user_id": None, "login_at": None, "validated_at": None})
+        if self.store.get("sessions", account):
+            self.store.put("sessions", account, {"_key": None, "user_id": None, "expire_time": None})
@@ -0,0 +1,132 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from resilience import CircuitBreaker
+
+
+@dataclass
+class AccountContext:
+    """
+    单个账号的身份信息，每个账号签到时新建，账号之间互不影响
+    """
+    account: str = ''
+    _key: str = ''
+    userid: str = ''
+    device_code: str = ''
+    phone_brand_type: str = ''
+    password: str = field(default='', repr=False)
+    # 本次签到中已获取的用户信息，避免重复请求
+    profile: dict = None
+    # 本次签到复用的缓存令牌，签到请求返回未登录错误时用于更新有效期估计
+    token: dict = None
+    # 本次签到中是否已因令牌失效重新登录过；只尝试一次，避免密码错误时每个版块都重新登录
+    relogin_tried: bool = False
+
+
+class SourceAddressAdapter(HTTPAdapter):
+    """
+    从指定的本机地址发出连接，用于多网卡或多 IP 的机器
+    """
+    def __init__(self, source_address: str, **kwargs):
+        self.source_address = (source_address, 0)
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["source_address"] = self.source_address
+        super().init_poolmanager(*args, **kwargs)
+
+
+class Transport:
+    """
+    由签到流程统一持有的 HTTP 传输层，所有账号共享同一个连接池。
+    连接保持 keep-alive，按并发数设置连接池大小，避免每个账号重复 TLS 握手。
+    每个请求都有超时，并按主机熔断：服务器不可用时所有账号一起暂停，而不是各自超时。
+    """
+    def __init__(self, pool_maxsize: int = 10, pool_connections: int = 4, timeout=(5, 15),
+                 breaker_factory=CircuitBreaker, proxy: str = None, source_address: str = None):
+        """
+        :param pool_maxsize: 每个主机保留的最大连接数，一般不小于并发账号数
+        :param pool_connections: 缓存连接池的主机数
+        :param timeout: 默认请求超时（连接超时, 读取超时），单位秒
+        :param breaker_factory: 创建主机熔断器的函数
+        :param proxy: 所有请求经过的代理，如 http://host:port、socks5://host:port（SOCKS 需安装 requests[socks]）
+        :param source_address: 发出连接的本机地址
+        """
+        self.session = requests.Session()
+        if proxy:
+            self.session.proxies = {"http": proxy, "https": proxy}
+        pool_kwargs = dict(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=False)
+        if source_address:
+            self.adapter = SourceAddressAdapter(source_address, **pool_kwargs)
+        else:
+            self.adapter = HTTPAdapter(**pool_kwargs)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.timeout = timeout
+        self.breaker_factory = breaker_factory
+        self.breakers = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = self.breakers[host] = self.breaker_factory()
+            return breaker
+
+    def acquire(self, url: str) -> float:
+        """
+        发送请求前调用，目标主机熔断期间阻塞等待。
+        与 request 分开调用，熔断等待不计入请求耗时
+        :return: 实际等待的秒数
+        """
+        start = time.monotonic()
+        self.breaker(urlsplit(url).netloc).acquire()
+        return time.monotonic() - start
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        发送请求并向熔断器反馈结果，调用前须先调用 acquire
+        """
+        breaker = self.breaker(urlsplit(url).netloc)
+        with self.lock:
+            self.requests += 1
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            res = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            breaker.record_failure()
+            raise
+        if res.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return res
+
+    def stats(self) -> dict:
+        """
+        连接复用统计
+        :return: requests 请求数，connections 新建连接数（即握手次数），reused 复用连接的请求数
+        """
+        connections = 0
+        # 经过代理的连接在代理专用的连接池中
+        for manager in [self.adapter.poolmanager, *self.adapter.proxy_manager.values()]:
+            pools = manager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+        return {
+            "requests": self.requests,
+            "connections": connections,
+            "reused": max(0, self.requests - connections),
+        }
+
+    def close(self):
+        self.session.close()